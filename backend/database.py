@@ -1,7 +1,14 @@
-# SQLAlchemy DB connection and session 
-from sqlalchemy import create_engine
+# SQLAlchemy DB connection and session
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from collections import deque
 import os
+import time
+import uuid
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,13 +22,155 @@ if not databaseUrl:
 if not databaseUrl.startswith('postgresql://'):
     raise RuntimeError("DATABASE_URL must point to a PostgreSQL database. ARRAY columns are not supported in SQLite.")
 
-engine = create_engine(databaseUrl) #Create database engine
+# Connection pool settings (applied per engine, per worker process)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Seconds; -1 never recycles
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))  # Route handlers only; 0 disables
+# PgBouncer in transaction mode can't keep prepared statements across transactions
+PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+
+class PoolMetrics:
+    # Checkout latency and connection counts for one engine's pool, fed by pool events
+
+    def __init__(self, name: str, samples: int = 1000):
+        self.name = name
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=samples)
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.engine = None
+
+    def increment(self, counter: str):
+        # Pool events fire on whichever thread uses the pool; += alone isn't atomic across them
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def recordWait(self, seconds: float):
+        with self.lock:
+            self.waits.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            waits = sorted(self.waits)
+            checkouts, connects, invalidations, timeouts = self.checkouts, self.connects, self.invalidations, self.timeouts
+        pool = self.engine.pool if self.engine is not None else None
+
+        def percentile(fraction):
+            return round(waits[min(int(len(waits) * fraction), len(waits) - 1)] * 1000, 3) if waits else 0.0
+
+        return {
+            "poolSize": pool.size() if pool else POOL_SIZE,
+            "maxOverflow": MAX_OVERFLOW,
+            "inUse": pool.checkedout() if pool else 0,
+            "idle": pool.checkedin() if pool else 0,
+            "overflow": max(pool.overflow(), 0) if pool else 0,
+            "checkouts": checkouts,
+            "connects": connects,
+            "invalidations": invalidations,
+            "timeouts": timeouts,
+            "checkoutWaitMs": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+
+poolMetrics = {"sync": PoolMetrics("sync"), "async": PoolMetrics("async")}
+
+class _TimedPool:
+    # Pool events fire after a connection is handed out, so the wait for a free
+    # slot (and any new connect) is timed around Pool.connect itself
+    metrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.increment("timeouts")
+            raise
+        finally:
+            self.metrics.recordWait(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    metrics = poolMetrics["sync"]
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    metrics = poolMetrics["async"]
+
+class TimedReplicaQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics("replica")
+
+def _trackPool(targetEngine, metrics: PoolMetrics):
+    metrics.engine = targetEngine
+
+    @event.listens_for(targetEngine, "connect")
+    def onConnect(dbapiConnection, connectionRecord):
+        metrics.increment("connects")
+
+    @event.listens_for(targetEngine, "checkout")
+    def onCheckout(dbapiConnection, connectionRecord, connectionProxy):
+        metrics.increment("checkouts")
+
+    @event.listens_for(targetEngine, "invalidate")
+    def onInvalidate(dbapiConnection, connectionRecord, exception):
+        metrics.increment("invalidations")
+
+poolOptions = dict(
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
+)
+
+engine = create_engine(databaseUrl, poolclass=TimedQueuePool, **poolOptions) #Create database engine (create_all, migrations, scripts)
 localSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 base = declarative_base()
+_trackPool(engine, poolMetrics["sync"])
+
+def _asyncUrl(url: str):
+    asyncUrl = make_url(url.replace('postgresql://', 'postgresql+asyncpg://', 1))
+    if PGBOUNCER:
+        asyncUrl = asyncUrl.update_query_dict({"prepared_statement_cache_size": "0"})
+    return asyncUrl
+
+asyncConnectArgs = {}
+# Request traffic only; migrations and scripts on the sync engine may legitimately run long.
+# PgBouncer rejects unknown startup parameters, so behind it set the timeout on the database role instead
+if STATEMENT_TIMEOUT_MS and not PGBOUNCER:
+    asyncConnectArgs["server_settings"] = {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}
+if PGBOUNCER:
+    # No prepared-statement caching in SQLAlchemy (see _asyncUrl) or asyncpg, and unique names for the
+    # unnamed ones asyncpg still prepares, so statements never collide across server connections
+    asyncConnectArgs["statement_cache_size"] = 0
+    asyncConnectArgs["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+
+# Async engine used by the route handlers so DB round trips don't block the event loop
+asyncEngine = create_async_engine(_asyncUrl(databaseUrl), poolclass=TimedAsyncQueuePool, connect_args=asyncConnectArgs, **poolOptions)
+asyncSession = async_sessionmaker(bind=asyncEngine, autoflush=False, expire_on_commit=False)
+_trackPool(asyncEngine.sync_engine, poolMetrics["async"])
+
+# Optional streaming replica for read-only handlers (see utils/read_routing.py); without one, reads use the primary
+replicaUrl = os.getenv('DATABASE_REPLICA_URL')
+if replicaUrl:
+    if not replicaUrl.startswith('postgresql://'):
+        raise RuntimeError("DATABASE_REPLICA_URL must point to a PostgreSQL database.")
+    poolMetrics["replica"] = TimedReplicaQueuePool.metrics
+    readEngine = create_async_engine(_asyncUrl(replicaUrl), poolclass=TimedReplicaQueuePool, connect_args=asyncConnectArgs, **poolOptions)
+    _trackPool(readEngine.sync_engine, poolMetrics["replica"])
+else:
+    readEngine = asyncEngine
+readSession = async_sessionmaker(bind=readEngine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = localSession() #Create a new session for the database
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with asyncSession() as db:
+        yield db
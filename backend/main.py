@@ -1,12 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import base, engine
+from fastapi.responses import ORJSONResponse
+from database import base, engine, poolMetrics
 import models.user
 import models.swipe
 import models.match
 import models.images
+import models.candidate_pool
+import models.user_stats
 from routes import auth, interactions, recommendations, profile, messages, images
+from utils import realtime
+from utils.image_processing import shutdownExecutor
+from utils.jwt_auth import verifyToken
+from utils.read_routing import markRecentWrite
+from utils.storage import storage, LocalStorage, ImmutableStaticFiles
+from utils.compression import CompressionMiddleware
+from utils.swipe_graph import startSwipeGraph, saveSwipeGraph
 import os
 from dotenv import load_dotenv
 
@@ -22,7 +31,9 @@ app = FastAPI(
     description="A college-specific dating app for UC students with endless scroll interface",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # orjson renders every router's JSON; the feed endpoints send pre-rendered cards (utils/profile_cards.py)
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration - use explicit origins for security
@@ -45,8 +56,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Explicit methods
     allow_headers=["*"],  # Keep headers flexible for auth tokens
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor (discover, matches, messages)
 )
 
+# gzip/brotli for JSON responses above COMPRESSION_MIN_SIZE (utils/compression.py)
+app.add_middleware(CompressionMiddleware)
+
+# Read-your-writes: after a successful mutation, that user's reads skip the replica for a while
+@app.middleware("http")
+async def trackRecentWrites(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        email = verifyToken(token) if scheme.lower() == "bearer" and token else None
+        if email is not None:
+            markRecentWrite(email)
+    return response
+
 # Include all API routers with proper prefixes
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(interactions.router, prefix="/interactions", tags=["Interactions"])
@@ -55,8 +81,33 @@ app.include_router(profile.router, prefix="/profile", tags=["Profile"])
 app.include_router(messages.router, prefix="/messages", tags=["Messages"])
 app.include_router(images.router, prefix="/images", tags=["Images"])
 
-# Mount static files for serving uploaded images
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Realtime fan-out: each worker relays Redis pub/sub events to its own WebSocket clients
+@app.on_event("startup")
+async def startRealtime():
+    await realtime.startListener()
+
+@app.on_event("shutdown")
+async def stopRealtime():
+    await realtime.stopListener()
+
+# In-memory likes for query-free "already liked" checks and exclusion (utils/swipe_graph.py)
+@app.on_event("startup")
+async def loadSwipeGraph():
+    await startSwipeGraph()
+
+@app.on_event("shutdown")
+async def snapshotSwipeGraph():
+    await saveSwipeGraph()
+
+# Image resizing runs in a process pool (utils/image_processing.py)
+@app.on_event("shutdown")
+async def stopImageWorkers():
+    shutdownExecutor()
+
+# Serve locally stored images only when nothing else does (S3 or a STORAGE_PUBLIC_URL host hands out their own URLs)
+if isinstance(storage, LocalStorage) and not storage.publicUrl:
+    os.makedirs(storage.root, exist_ok=True)
+    app.mount(f"/{storage.root}", ImmutableStaticFiles(directory=storage.root), name="uploads")
 
 
 @app.get("/")
@@ -75,3 +126,7 @@ async def root():
         ]
     }
 
+# Connection pool health for this worker (checkout wait, in-use and overflow connections)
+@app.get("/metrics/db")
+async def databaseMetrics():
+    return {name: metrics.snapshot() for name, metrics in poolMetrics.items()}
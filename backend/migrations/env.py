@@ -0,0 +1,33 @@
+from alembic import context
+from database import base, engine
+import models.user
+import models.swipe
+import models.match
+import models.images
+import models.message
+import models.preference
+import models.candidate_pool
+import models.user_stats
+
+# DATABASE_URL comes from the same .env the app uses (see database.py)
+target_metadata = base.metadata
+
+def runMigrationsOffline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def runMigrationsOnline():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    runMigrationsOffline()
+else:
+    runMigrationsOnline()
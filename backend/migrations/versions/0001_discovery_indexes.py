@@ -0,0 +1,45 @@
+"""Partial B-tree and GIN indexes for the discovery predicates
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+APPROVED = sa.text("\"moderationStatus\" = 'Approved'")
+
+def upgrade():
+    # CONCURRENTLY can't run inside a transaction, and keeps the users table writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index('idx_users_approved_college_gender_age', 'users',
+                        ['college', 'gender', 'age'],
+                        postgresql_where=APPROVED, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('idx_users_approved_gender_pref_age_window', 'users',
+                        ['genderPref', 'minAge', 'maxAge'],
+                        postgresql_where=APPROVED, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('idx_users_approved_other_colleges', 'users', ['otherColleges'],
+                        postgresql_using='gin', postgresql_where=APPROVED,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('idx_users_approved_majors', 'users', ['majors'],
+                        postgresql_using='gin', postgresql_where=APPROVED,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('idx_swipe_target_liked', 'swipes', ['targetId', 'userId'],
+                        postgresql_where=sa.text('"isLike" = true'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, name in [
+            ('swipes', 'idx_swipe_target_liked'),
+            ('users', 'idx_users_approved_majors'),
+            ('users', 'idx_users_approved_other_colleges'),
+            ('users', 'idx_users_approved_gender_pref_age_window'),
+            ('users', 'idx_users_approved_college_gender_age'),
+        ]:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
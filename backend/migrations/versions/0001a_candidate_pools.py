@@ -0,0 +1,30 @@
+"""Per-viewer discovery candidate pools
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # The tables as they were first introduced; later revisions add their columns.
+    # IF NOT EXISTS: a worker started before migrating may already have created them
+    op.create_table('candidate_pools',
+        sa.Column('viewerId', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('candidateId', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        if_not_exists=True)
+    op.create_index('idx_candidate_pool_candidate', 'candidate_pools', ['candidateId'], if_not_exists=True)
+    op.create_table('candidate_pool_states',
+        sa.Column('userId', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('builtAt', sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True)
+
+def downgrade():
+    op.drop_table('candidate_pool_states', if_exists=True)
+    op.drop_table('candidate_pools', if_exists=True)
@@ -0,0 +1,23 @@
+"""Ranking score on candidate_pools
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('candidate_pools', sa.Column('score', sa.Float(), nullable=False, server_default='0'), if_not_exists=True)
+    op.create_index('idx_candidate_pool_viewer_score', 'candidate_pools', ['viewerId', sa.text('score DESC')], if_not_exists=True)
+    # Existing pools were never scored; dropping their state rebuilds them lazily on next discover
+    op.execute('DELETE FROM candidate_pool_states')
+
+def downgrade():
+    op.drop_index('idx_candidate_pool_viewer_score', table_name='candidate_pools')
+    op.drop_column('candidate_pools', 'score')
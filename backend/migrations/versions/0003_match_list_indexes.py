@@ -0,0 +1,24 @@
+"""Per-user indexes for the newest-first match list
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_match_user1_created', 'matches', ['userId1', 'createdAt'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('idx_match_user2_created', 'matches', ['userId2', 'createdAt'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_match_user2_created', table_name='matches', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('idx_match_user1_created', table_name='matches', postgresql_concurrently=True, if_exists=True)
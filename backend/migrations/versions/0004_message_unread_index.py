@@ -0,0 +1,23 @@
+"""Partial index for per-conversation unread counts
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_message_unread', 'messages', ['conversationId', 'senderId'],
+                        postgresql_where=sa.text('"isRead" = false'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_message_unread', table_name='messages', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,22 @@
+"""Composite index for cursor-paginated message history
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_message_conversation_created', 'messages', ['conversationId', 'createdAt', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_message_conversation_created', table_name='messages',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,24 @@
+"""Resized WebP variant URLs on images
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Images uploaded before this keep only imageUrl (the original file)
+    op.add_column('images', sa.Column('smallUrl', sa.String(), nullable=True), if_not_exists=True)
+    op.add_column('images', sa.Column('mediumUrl', sa.String(), nullable=True), if_not_exists=True)
+    op.add_column('images', sa.Column('largeUrl', sa.String(), nullable=True), if_not_exists=True)
+
+def downgrade():
+    op.drop_column('images', 'largeUrl')
+    op.drop_column('images', 'mediumUrl')
+    op.drop_column('images', 'smallUrl')
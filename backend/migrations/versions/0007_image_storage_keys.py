@@ -0,0 +1,29 @@
+"""Store image storage keys instead of local upload paths
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ['imageUrl', 'smallUrl', 'mediumUrl', 'largeUrl']
+
+def upgrade():
+    # "uploads/images/x.webp" -> "images/x.webp"; LocalStorage keeps files in the same place
+    for column in COLUMNS:
+        op.execute(
+            f'UPDATE images SET "{column}" = substr("{column}", length(\'uploads/\') + 1) '
+            f'WHERE "{column}" LIKE \'uploads/%\''
+        )
+
+def downgrade():
+    for column in COLUMNS:
+        op.execute(
+            f'UPDATE images SET "{column}" = \'uploads/\' || "{column}" '
+            f'WHERE "{column}" IS NOT NULL AND "{column}" NOT LIKE \'http%\''
+        )
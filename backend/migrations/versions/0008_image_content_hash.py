@@ -0,0 +1,26 @@
+"""Content hash on images for deduplicated, reference-counted variant files
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing rows keep a NULL hash and their own (unshared) files
+    op.add_column('images', sa.Column('contentHash', sa.String(length=40), nullable=True), if_not_exists=True)
+    with op.get_context().autocommit_block():
+        op.create_index('idx_images_content_hash', 'images', ['contentHash'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_images_content_hash', table_name='images',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('images', 'contentHash')
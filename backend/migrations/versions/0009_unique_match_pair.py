@@ -0,0 +1,34 @@
+"""Unique index on matches (userId1, userId2)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Races between mutual likes could leave duplicate matches; keep the oldest of each pair
+    op.execute(
+        'DELETE FROM matches m USING matches older '
+        'WHERE least(m."userId1", m."userId2") = least(older."userId1", older."userId2") '
+        'AND greatest(m."userId1", m."userId2") = greatest(older."userId1", older."userId2") '
+        'AND older.id < m.id'
+    )
+    # The lower ID always goes first
+    op.execute(
+        'UPDATE matches SET "userId1" = "userId2", "userId2" = "userId1" '
+        'WHERE "userId1" > "userId2"'
+    )
+    with op.get_context().autocommit_block():
+        op.create_index('uq_match_users', 'matches', ['userId1', 'userId2'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_match_users', table_name='matches',
+                      postgresql_concurrently=True, if_exists=True)
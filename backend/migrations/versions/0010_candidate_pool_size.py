@@ -0,0 +1,22 @@
+"""Stored pool size on candidate_pool_states for approximate discovery counts
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Left NULL: the first stats read of a big pool counts it
+    op.add_column('candidate_pool_states', sa.Column('poolSize', sa.Integer(), nullable=True), if_not_exists=True)
+    op.add_column('candidate_pool_states', sa.Column('countedAt', sa.DateTime(), nullable=True), if_not_exists=True)
+
+def downgrade():
+    op.drop_column('candidate_pool_states', 'countedAt')
+    op.drop_column('candidate_pool_states', 'poolSize')
@@ -0,0 +1,20 @@
+"""Profile version on users for the profile card cache
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Constant default, so no table rewrite
+    op.add_column('users', sa.Column('profileVersion', sa.Integer(), nullable=False, server_default='1'), if_not_exists=True)
+
+def downgrade():
+    op.drop_column('users', 'profileVersion')
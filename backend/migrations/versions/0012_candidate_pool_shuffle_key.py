@@ -0,0 +1,27 @@
+"""Stored shuffle key on candidate_pools and an index in discover page order
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Volatile default: existing pairs each get their own key as the table is rewritten
+    op.add_column('candidate_pools', sa.Column(
+        'shuffleKey', sa.Integer(), nullable=False, server_default=sa.text("floor(random() * 2147483647)::int")
+    ), if_not_exists=True)
+    op.drop_index('idx_candidate_pool_viewer_score', table_name='candidate_pools', if_exists=True)
+    op.create_index('idx_candidate_pool_viewer_rank', 'candidate_pools',
+                    ['viewerId', sa.text('(-score)'), 'shuffleKey', 'candidateId'], if_not_exists=True)
+
+def downgrade():
+    op.drop_index('idx_candidate_pool_viewer_rank', table_name='candidate_pools')
+    op.create_index('idx_candidate_pool_viewer_score', 'candidate_pools', ['viewerId', sa.text('score DESC')])
+    op.drop_column('candidate_pools', 'shuffleKey')
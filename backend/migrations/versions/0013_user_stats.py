@@ -0,0 +1,27 @@
+"""Per-user like and match counters for discovery stats
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Starts empty: a user without a reconciled row is recounted on their first stats read.
+    # IF NOT EXISTS: a worker started before migrating may already have created it
+    op.create_table('user_stats',
+        sa.Column('userId', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('likesSent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('likesReceived', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('matches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('reconciledAt', sa.DateTime(), nullable=True),
+        if_not_exists=True)
+
+def downgrade():
+    op.drop_table('user_stats', if_exists=True)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, Float, text
+from sqlalchemy.sql import func
+from database import base
+
+class CandidatePool(base):
+    __tablename__ = 'candidate_pools'
+
+    # One row per (viewer, candidate) pair that passes the mutual compatibility filters
+    viewerId = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    candidateId = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    score = Column(Float, nullable=False, default=0.0, server_default='0') # Ranking score (utils/ranking.py), higher first
+    shuffleKey = Column(Integer, nullable=False, server_default=text("floor(random() * 2147483647)::int")) # Random order among equal scores, drawn when the pair enters the pool
+
+    __table_args__ = (
+        # Reverse lookup used when a candidate's profile changes
+        Index('idx_candidate_pool_candidate', candidateId),
+        # Discover pages walk a viewer's pool in exactly this order (best score first), so each
+        # page is an index range scan that stops after `limit` rows
+        Index('idx_candidate_pool_viewer_rank', viewerId, -score, shuffleKey, candidateId),
+    )
+
+class CandidatePoolState(base):
+    __tablename__ = 'candidate_pool_states'
+
+    # Marks a viewer's pool as materialized (an empty pool is still a built pool)
+    userId = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    builtAt = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    # Pool size as of countedAt, less the viewer's own likes since; the approximate count for big pools
+    poolSize = Column(Integer, nullable=True)
+    countedAt = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import base
@@ -9,10 +9,19 @@ class Image(base):
     # Primary key and identification
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey('users.id'), nullable=False)
-    imageUrl = Column(String, nullable=False) # URL/path to the image file
+    imageUrl = Column(String, nullable=False) # Storage key of the image file (the largest variant for processed uploads)
+    smallUrl = Column(String, nullable=True) # Storage key of the 200px WebP variant (avatars, thumbnails)
+    mediumUrl = Column(String, nullable=True) # Storage key of the 600px WebP variant (feed and match cards)
+    largeUrl = Column(String, nullable=True) # Storage key of the 1200px WebP variant (full profile view)
+    contentHash = Column(String(40), nullable=True) # BLAKE2b of the upload; variant files are shared by every row with this hash
     isPrimary = Column(Boolean, default=False, nullable=False) # Whether this is the user's main profile picture
     createdAt = Column(DateTime, server_default=func.now())
     
     user = relationship("User")
 
+    __table_args__ = (
+        # Reference counting for shared variant files (dedup on upload, cleanup on delete)
+        Index('idx_images_content_hash', contentHash),
+    )
+
    
\ No newline at end of file
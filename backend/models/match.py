@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from database import base
 
@@ -8,4 +8,12 @@ class Match(base):
     id = Column(Integer, primary_key=True, index=True)
     userId1 = Column(Integer, ForeignKey('users.id'), nullable=False)
     userId2 = Column(Integer, ForeignKey('users.id'), nullable=False)
-    createdAt = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    createdAt = Column(DateTime, server_default=func.now())
+
+    # Match lists are read per user, newest first
+    __table_args__ = (
+        # One match per pair (userId1 is always the lower ID); likes rely on it to upsert matches
+        Index('uq_match_users', userId1, userId2, unique=True),
+        Index('idx_match_user1_created', userId1, createdAt),
+        Index('idx_match_user2_created', userId2, createdAt),
+    )
\ No newline at end of file
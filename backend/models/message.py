@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Boolean, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Boolean, UniqueConstraint, CheckConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import base
@@ -35,4 +35,11 @@ class Message(base):
     createdAt = Column(DateTime, server_default=func.now())
     
     # Relationships
-    sender = relationship("User", foreign_keys=[senderId])
\ No newline at end of file
+    sender = relationship("User", foreign_keys=[senderId])
+    
+    __table_args__ = (
+        # Message history is paged newest first per conversation
+        Index('idx_message_conversation_created', conversationId, createdAt, id),
+        # Unread counts only ever look at unread messages
+        Index('idx_message_unread', conversationId, senderId, postgresql_where=isRead == False),
+    )
\ No newline at end of file
@@ -11,4 +11,8 @@ class Swipe(base):
     isLike = Column(Boolean, nullable=False)
     createdAt = Column(DateTime, server_default=func.now())
 
-    __table_args__ = (Index('idx_swipe_user_target', userId, targetId, unique=True),)
\ No newline at end of file
+    __table_args__ = (
+        Index('idx_swipe_user_target', userId, targetId, unique=True),
+        # Likes received / mutual-like lookups go by target
+        Index('idx_swipe_target_liked', targetId, userId, postgresql_where=isLike == True),
+    )
\ No newline at end of file
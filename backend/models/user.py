@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Index
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from database import base
@@ -19,6 +19,7 @@ class User(base):
     major = Column(String, nullable=False) # Academic major
     moderationStatus = Column(String, nullable=False, default="Pending") # Account status: Pending, Approved, Rejected
     createdAt = Column(DateTime, server_default=func.now()) # Account creation timestamp
+    profileVersion = Column(Integer, nullable=False, default=1, server_default='1') # Bumped on every change shown on the profile card (utils/profile_cards.py)
 
     # Profile Information
     bio = Column(Text, nullable=False) # Personal description/bio
@@ -39,13 +40,26 @@ class User(base):
     majors = Column(ARRAY(String), nullable=False) # Preferred majors for matches
 
     # Relationships to other models
-    images = relationship("Image", cascade="all, delete-orphan") # User's profile images
+    images = relationship("Image", cascade="all, delete-orphan", lazy="selectin") # User's profile images (eager: responses always include them, and async sessions can't lazy-load)
 
     #Interaction and Match Relationships
     sentSwipes = relationship("Swipe", foreign_keys="Swipe.userId") # Likes sent by this user
     receivedSwipes = relationship("Swipe", foreign_keys="Swipe.targetId") # Likes received by this user
     matchesAsUser1 = relationship("Match", foreign_keys="Match.userId1") # Matches where this user is user1
     matchesAsUser2 = relationship("Match", foreign_keys="Match.userId2") # Matches where this user is user2
+
+    # Indexes for the discovery predicates; only approved profiles are ever recommended.
+    # Existing databases get these through migrations/versions/0001_discovery_indexes.py
+    __table_args__ = (
+        Index('idx_users_approved_college_gender_age', college, gender, age,
+              postgresql_where=moderationStatus == 'Approved'),
+        Index('idx_users_approved_gender_pref_age_window', genderPref, minAge, maxAge,
+              postgresql_where=moderationStatus == 'Approved'),
+        Index('idx_users_approved_other_colleges', otherColleges, postgresql_using='gin',
+              postgresql_where=moderationStatus == 'Approved'),
+        Index('idx_users_approved_majors', majors, postgresql_using='gin',
+              postgresql_where=moderationStatus == 'Approved'),
+    )
     
 
     
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from database import base
+
+class UserStats(base):
+    __tablename__ = 'user_stats'
+
+    # Per-user counters behind /recommendations/stats, bumped by like/match writes (utils/user_stats.py)
+    userId = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    likesSent = Column(Integer, nullable=False, default=0, server_default='0')
+    likesReceived = Column(Integer, nullable=False, default=0, server_default='0')
+    matches = Column(Integer, nullable=False, default=0, server_default='0')
+    reconciledAt = Column(DateTime, nullable=True) # Last recount from swipes/matches; NULL until the first one
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.user import User
 from schemas.user import UserCreate, UserResponse, EmailVerificationRequest, EmailVerificationResponse, Token
 from utils.auth import generateVerificationCode, storeVerificationCode, getVerificationCode, deleteVerificationCode, sendVerificationEmail
 from utils.jwt_auth import createAccessToken
+from utils.candidate_pool import refreshUser
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
@@ -19,14 +21,14 @@ def validateUCEmail(email: str) -> bool:
     return any(email.endswith(domain) for domain in UC_EMAIL_DOMAINS)
 
 @router.post("/register/sendVerification", response_model=EmailVerificationResponse)
-async def sendRegistrationVerification(email: str, db: Session = Depends(get_db)):
+async def sendRegistrationVerification(email: str, db: AsyncSession = Depends(get_async_db)):
     if not validateUCEmail(email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Please use a valid UC email address"
         )
     
-    existingUser = db.query(User).filter(User.email == email).first()
+    existingUser = (await db.execute(select(User.id).where(User.email == email))).first()
     if existingUser:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, 
@@ -51,7 +53,7 @@ async def sendRegistrationVerification(email: str, db: Session = Depends(get_db)
     return EmailVerificationResponse(message="Verification code sent", verified=False)
 
 @router.post("/register", response_model=UserResponse)
-async def register(userData: UserCreate, db: Session = Depends(get_db)):
+async def register(userData: UserCreate, db: AsyncSession = Depends(get_async_db)):
     #Verify verification code
     storedCode = getVerificationCode(userData.email)
     if not storedCode or storedCode != userData.verificationCode:
@@ -89,21 +91,23 @@ async def register(userData: UserCreate, db: Session = Depends(get_db)):
     try:
         # Add to database
         db.add(newUser)
-        db.commit()
-        db.refresh(newUser)
+        await db.flush()
+        await db.run_sync(refreshUser, newUser.id)
+        await db.commit()
+        await db.refresh(newUser)
         deleteVerificationCode(userData.email)
         return newUser
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Could not create user"
         )
 
 @router.post("/login/sendVerification", response_model=EmailVerificationResponse)
-async def sendLoginVerification(email: str, db: Session = Depends(get_db)):
+async def sendLoginVerification(email: str, db: AsyncSession = Depends(get_async_db)):
     #Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User.id).where(User.email == email))).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -128,7 +132,7 @@ async def sendLoginVerification(email: str, db: Session = Depends(get_db)):
     return EmailVerificationResponse(message="Verification code sent to email", verified=False)
 
 @router.post("/login", response_model=Token)
-async def login(request: EmailVerificationRequest, db: Session = Depends(get_db)):
+async def login(request: EmailVerificationRequest, db: AsyncSession = Depends(get_async_db)):
     storedCode = getVerificationCode(request.email)
     if not storedCode or storedCode != request.verificationCode:
         raise HTTPException(
@@ -136,7 +140,7 @@ async def login(request: EmailVerificationRequest, db: Session = Depends(get_db)
             detail="Invalid verification code!"
         )
     
-    user = db.query(User).filter(User.email == request.email).first()
+    user = (await db.execute(select(User.email).where(User.email == request.email))).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,7 +153,7 @@ async def login(request: EmailVerificationRequest, db: Session = Depends(get_db)
     return Token(accessToken=accessToken, tokenType="bearer")
 
 @router.post("/resendVerification", response_model=EmailVerificationResponse)
-async def resendVerification(email: str, db: Session = Depends(get_db)):
+async def resendVerification(email: str, db: AsyncSession = Depends(get_async_db)):
     if not validateUCEmail(email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,114 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.images import Image
-from models.user import User
 from schemas.images import ImageCreate, ImageResponse, ImageUpdate
-from utils.jwt_auth import getCurrentUser
+from utils.jwt_auth import getCurrentPrincipal, Principal
+from utils.image_processing import processUpload, removeFile, InvalidImageError, VARIANT_SPEC
+from utils.uploads import receiveUpload
+from utils.storage import storage, LocalStorage
+from utils.profile_cards import bumpProfileVersion
+from utils.http_cache import conditionalResponse
+from pydantic import TypeAdapter
 from sqlalchemy.exc import IntegrityError
 import os
 import uuid
-from typing import List
-import shutil
+import tempfile
+import hashlib
+import logging
+from typing import List, Dict, Tuple
 
 router = APIRouter(tags=["Images"])
+logger = logging.getLogger(__name__)
 
 # Configuration for image storage
-UPLOAD_DIR = "uploads/images"
-ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".jfif"}
+# Raw uploads (EXIF/GPS and all) and freshly rendered variants before they go to storage.
+# Must not be under a served directory: the originals would be downloadable while they're processed
+WORK_DIR = os.getenv('UPLOAD_WORK_DIR', os.path.join(tempfile.gettempdir(), 'ucme-uploads'))
+IMAGE_PREFIX = "images"  # Storage key prefix (utils/storage.py)
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+imageList = TypeAdapter(List[ImageResponse])
 
-def is_valid_image_file(filename: str) -> bool:
-    return any(filename.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS)
+if isinstance(storage, LocalStorage) and storage.servesPath(WORK_DIR):
+    raise RuntimeError(f"UPLOAD_WORK_DIR ({WORK_DIR}) must be outside LOCAL_STORAGE_ROOT, which is served at /uploads")
 
-def save_image_file(file: UploadFile, user_id: int) -> str:
+# Ensure work directory exists
+os.makedirs(WORK_DIR, exist_ok=True)
 
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    unique_filename = f"{user_id}_{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+async def lock_content_hash(db: AsyncSession, content_hash: str):
+    # Serializes uploads and deletes of the same content until the transaction ends,
+    # so the reference count can't change between checking it and touching the files
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(content_hash))))
+
+async def save_image_file(request: Request, user_id: int, db: AsyncSession) -> Tuple[Dict[str, str], Dict[str, str], str, bool]:
+
+    # Unique work file; the type comes from the file's magic bytes, not its name
+    file_path = os.path.join(WORK_DIR, f"{user_id}_{uuid.uuid4()}.upload")
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Stream the body to disk, rejecting oversized or non-image files as soon as that's known.
+    # The hash covers the variant settings too, so new settings never reuse old (immutable) keys
+    hasher = hashlib.blake2b(VARIANT_SPEC.encode(), digest_size=20)
+    fields = await receiveUpload(request, "file", file_path, MAX_FILE_SIZE, hasher)
+    content_hash = hasher.hexdigest()
+    
+    try:
+        # Same bytes already stored: share the existing variants instead of rendering them again
+        await lock_content_hash(db, content_hash)
+        existing = (await db.scalars(select(Image).where(Image.contentHash == content_hash).limit(1))).first()
+        if existing:
+            keys = {"small": existing.smallUrl, "medium": existing.mediumUrl, "large": existing.largeUrl}
+            return keys, fields, content_hash, False
+        
+        # Replace the raw upload with resized WebP variants (metadata stripped)
+        try:
+            variants = await processUpload(file_path, WORK_DIR, content_hash)
+        except InvalidImageError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid or unsupported image file"
+            )
+    finally:
+        # The original is never served
+        removeFile(file_path)
     
-    return file_path
+    # Hand the variants to storage; the database keeps their keys
+    keys = {}
+    try:
+        for size, path in variants.items():
+            key = f"{IMAGE_PREFIX}/{os.path.basename(path)}"
+            await storage.put(path, key, "image/webp")
+            keys[size] = key
+    except Exception:
+        await delete_image_files(keys.values())
+        for path in variants.values():
+            removeFile(path)
+        raise
+    
+    return keys, fields, content_hash, True
+
+async def delete_image_files(keys):
+    for key in keys:
+        try:
+            await storage.delete(key)
+        except Exception:
+            logger.exception(f"Failed to delete image {key}")
+
+async def delete_unreferenced_files(db: AsyncSession, image: Image):
+    # Files are shared by every row with the same content hash; older rows have none and own their files.
+    # Counted under the hash lock, so an upload reusing these files either committed its row
+    # already (and is counted) or runs after the files are gone (and renders them again)
+    references = 0
+    if image.contentHash:
+        await lock_content_hash(db, image.contentHash)
+        references = await db.scalar(select(func.count(Image.id)).where(Image.contentHash == image.contentHash))
+    
+    # Delete the files from storage once nothing references them (older uploads only have the original)
+    if references == 0:
+        await delete_image_files({image.imageUrl, image.smallUrl, image.mediumUrl, image.largeUrl} - {None})
+    await db.commit()  # Releases the lock
 
-@router.post("/upload", response_model=ImageResponse)
+# Multipart form: file (JPEG, PNG, GIF, WebP or HEIC/HEIF), isPrimary (optional bool).
+# Read straight from the request stream rather than through UploadFile, which buffers the whole body first
+@router.post("/upload", response_model=ImageResponse, openapi_extra={
+    "requestBody": {"content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file"],
+        "properties": {
+            "file": {"type": "string", "format": "binary"},
+            "isPrimary": {"type": "boolean", "default": False}
+        }
+    }}}, "required": True}
+})
 async def uploadImage(
-    file: UploadFile = File(...),
-    isPrimary: bool = Form(False),
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    request: Request,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
-    # Validate file type
-    if not is_valid_image_file(file.filename):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
-    
     # Enforce maximum of 3 images per user
-    current_count = db.query(Image).filter(Image.userId == currentUser.id).count()
+    current_count = await db.scalar(select(func.count(Image.id)).where(Image.userId == currentUser.id))
     if current_count >= 3:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Maximum of 3 images allowed"
         )
     
-    # Check file size safely
     try:
-        current_pos = file.file.tell()
+        variants, fields, content_hash, created = await save_image_file(request, currentUser.id, db)
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception:
-        current_pos = 0
-    try:
-        file.file.seek(0, os.SEEK_END)
-        size_bytes = file.file.tell()
-    finally:
-        file.file.seek(current_pos, os.SEEK_SET)
-    if size_bytes and size_bytes > MAX_FILE_SIZE:
+        await db.rollback()
+        logger.exception("Image storage error")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to upload image"
         )
+    isPrimary = fields.get("isPrimary", "false").strip().lower() in ("true", "1", "on", "yes")
     
     try:
-        # Save the file (ensure pointer at start)
-        file.file.seek(0)
-        file_path = save_image_file(file, currentUser.id)
-        
         # If this is set as primary, unset other primary images
         if isPrimary:
-            db.query(Image).filter(
+            await db.execute(update(Image).where(
                 Image.userId == currentUser.id,
                 Image.isPrimary == True
-            ).update({"isPrimary": False})
+            ).values(isPrimary=False))
         
         # Create image record
         image = Image(
             userId=currentUser.id,
-            imageUrl=file_path,
+            imageUrl=variants["large"],
+            smallUrl=variants["small"],
+            mediumUrl=variants["medium"],
+            largeUrl=variants["large"],
+            contentHash=content_hash,
             isPrimary=isPrimary
         )
         
         db.add(image)
-        db.commit()
-        db.refresh(image)
+        # Profile cards show the images
+        await bumpProfileVersion(db, currentUser.id)
+        await db.commit()
+        await db.refresh(image)
         
         return image
         
     except Exception as e:
-        db.rollback()
-        # Clean up uploaded file if database operation fails
-        if 'file_path' in locals():
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        await db.rollback()
+        # Clean up the stored variants if the database operation fails (shared ones belong to other rows)
+        if created:
+            await delete_image_files(variants.values())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to upload image"
@@ -116,24 +188,26 @@ async def uploadImage(
 
 @router.get("/my-images", response_model=List[ImageResponse])
 async def getMyImages(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    request: Request,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    images = db.query(Image).filter(Image.userId == currentUser.id).all()
-    return images
+    # Stable order, so the same images always give the same ETag
+    images = (await db.scalars(select(Image).where(Image.userId == currentUser.id).order_by(Image.id))).all()
+    return conditionalResponse(request, imageList.dump_json(images))
 
 @router.put("/{imageId}/set-primary", response_model=ImageResponse)
 async def setPrimaryImage(
     imageId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get the image
-    image = db.query(Image).filter(
+    image = (await db.scalars(select(Image).where(
         Image.id == imageId,
         Image.userId == currentUser.id
-    ).first()
+    ))).first()
     
     if not image:
         raise HTTPException(
@@ -143,20 +217,21 @@ async def setPrimaryImage(
     
     try:
         # Unset all other primary images for this user
-        db.query(Image).filter(
+        await db.execute(update(Image).where(
             Image.userId == currentUser.id,
             Image.isPrimary == True
-        ).update({"isPrimary": False})
+        ).values(isPrimary=False))
         
         # Set this image as primary
         image.isPrimary = True
-        db.commit()
-        db.refresh(image)
+        await bumpProfileVersion(db, currentUser.id)
+        await db.commit()
+        await db.refresh(image)
         
         return image
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to set primary image"
@@ -165,15 +240,15 @@ async def setPrimaryImage(
 @router.delete("/{imageId}")
 async def deleteImage(
     imageId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get the image
-    image = db.query(Image).filter(
+    image = (await db.scalars(select(Image).where(
         Image.id == imageId,
         Image.userId == currentUser.id
-    ).first()
+    ))).first()
     
     if not image:
         raise HTTPException(
@@ -182,7 +257,7 @@ async def deleteImage(
         )
     
     # Don't allow deletion of the only image if it's primary
-    user_image_count = db.query(Image).filter(Image.userId == currentUser.id).count()
+    user_image_count = await db.scalar(select(func.count(Image.id)).where(Image.userId == currentUser.id))
     if user_image_count == 1 and image.isPrimary:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -190,36 +265,39 @@ async def deleteImage(
         )
     
     try:
-        # Delete the file from storage
-        if os.path.exists(image.imageUrl):
-            os.remove(image.imageUrl)
-        
         # Delete from database
-        db.delete(image)
-        db.commit()
-        
-        return {"message": "Image deleted successfully"}
-        
+        await db.delete(image)
+        await bumpProfileVersion(db, currentUser.id)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete image"
         )
+    
+    # Files go only once the row is gone for good; a failed cleanup just leaves them unreferenced
+    try:
+        await delete_unreferenced_files(db, image)
+    except Exception:
+        await db.rollback()
+        logger.exception(f"Failed to clean up files of image {image.id}")
+    
+    return {"message": "Image deleted successfully"}
 
 @router.put("/{imageId}", response_model=ImageResponse)
 async def updateImage(
     imageId: int,
     imageUpdate: ImageUpdate,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get the image
-    image = db.query(Image).filter(
+    image = (await db.scalars(select(Image).where(
         Image.id == imageId,
         Image.userId == currentUser.id
-    ).first()
+    ))).first()
     
     if not image:
         raise HTTPException(
@@ -233,24 +311,25 @@ async def updateImage(
         # Handle primary image logic
         if 'isPrimary' in update_data and update_data['isPrimary']:
             # Unset other primary images
-            db.query(Image).filter(
+            await db.execute(update(Image).where(
                 Image.userId == currentUser.id,
                 Image.id != imageId,
                 Image.isPrimary == True
-            ).update({"isPrimary": False})
+            ).values(isPrimary=False))
         
         # Update the image
         for field, value in update_data.items():
             if hasattr(image, field):
                 setattr(image, field, value)
         
-        db.commit()
-        db.refresh(image)
+        await bumpProfileVersion(db, currentUser.id)
+        await db.commit()
+        await db.refresh(image)
         
         return image
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update image"
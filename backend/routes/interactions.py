@@ -1,34 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic_core import to_json
+from sqlalchemy import and_, case, tuple_, select, update, delete, exists, func, literal, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.user import User
 from models.swipe import Swipe
 from models.match import Match
-from schemas.swipe import SwipeCreate, SwipeResponse
+from models.candidate_pool import CandidatePool, CandidatePoolState
+from schemas.swipe import SwipeCreate, SwipeResponse, SwipeBatch, SwipeBatchResult
 from schemas.match import MatchResponse
-from utils.jwt_auth import getCurrentUser
-from typing import List
+from schemas.user import UserCard
+from utils.jwt_auth import getCurrentPrincipal, Principal
+from utils.candidate_pool import removeCandidates
+from utils.pagination import encodeCursor, decodeCursor
+from utils.realtime import publishEvent
+from utils.passes import recordPasses
+from utils.swipe_graph import hasLiked, likedIds, likedByIds, recordLikes
+from utils.user_stats import likeCountersCte, incrementStats
+from utils.read_routing import get_read_db
+from utils.profile_cards import profileCardMap, cardListResponse
+from typing import List, Optional
+from datetime import datetime
+import logging
 
 router = APIRouter(tags=["Interactions"])
+logger = logging.getLogger(__name__)
+
+async def lockPairs(db: AsyncSession, userId: int, otherIds):
+    # Mutual likes of the same pair run one after the other, so the second always sees the first
+    # (otherwise each can miss the other's uncommitted like and the match is lost).
+    # Locks are taken in pair order in one statement, so concurrent batches can't deadlock
+    pairs = sorted((min(userId, otherId), max(userId, otherId)) for otherId in otherIds)
+    if pairs:
+        await db.execute(select(*(func.pg_advisory_xact_lock(low, high) for low, high in pairs)))
 
 @router.post("/like", response_model=SwipeResponse)
 async def likeProfile(
     targetId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-
-    # Verify target user exists and is approved
-    targetUser = db.query(User).filter(
-        User.id == targetId,
-        User.moderationStatus == "Approved"
-    ).first()
-    
-    if not targetUser:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
     
     # Prevent users from liking themselves
     if targetId == currentUser.id:
@@ -37,83 +49,107 @@ async def likeProfile(
             detail="Cannot like your own profile"
         )
     
-    # Check if user has already liked this profile
-    existingSwipe = db.query(Swipe).filter(
-        Swipe.userId == currentUser.id,
-        Swipe.targetId == targetId
-    ).first()
-    
-    if existingSwipe:
+    # Repeat likes are answered from memory; the statement below still checks, in case this worker lags
+    if hasLiked(currentUser.id, targetId):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Already liked this profile"
         )
     
-    # Create like record (only likes are stored, not passes)
-    newSwipe = Swipe(
-        userId=currentUser.id,
-        targetId=targetId,
-        isLike=True  # Only likes are recorded
-    )
+    userId1, userId2 = min(currentUser.id, targetId), max(currentUser.id, targetId)  # Lower ID always first for consistency
+    
+    # One statement: verify the target, record the like (only likes are stored, not passes),
+    # drop the target from the liker's discovery pool, create the match if the like is mutual
+    # and bump both users' stats counters
+    target = select(User.id).where(
+        User.id == targetId,
+        User.moderationStatus == "Approved"
+    ).cte("target")
+    newSwipe = pg_insert(Swipe).from_select(
+        ["userId", "targetId", "isLike"],
+        select(literal(currentUser.id), target.c.id, true())
+    ).on_conflict_do_nothing(index_elements=["userId", "targetId"]).returning(Swipe.id).cte("new_swipe")
+    unpooled = delete(CandidatePool).where(
+        CandidatePool.viewerId == currentUser.id,
+        CandidatePool.candidateId == targetId
+    ).returning(CandidatePool.candidateId).cte("unpooled")
+    shrunk = update(CandidatePoolState).where(
+        CandidatePoolState.userId == currentUser.id,
+        exists(select(unpooled.c.candidateId))
+    ).values(poolSize=CandidatePoolState.poolSize - 1).returning(CandidatePoolState.userId).cte("shrunk")
+    newMatch = pg_insert(Match).from_select(
+        ["userId1", "userId2"],
+        select(literal(userId1), literal(userId2)).where(
+            exists(select(newSwipe.c.id)),
+            exists().where(
+                Swipe.userId == targetId,
+                Swipe.targetId == currentUser.id,
+                Swipe.isLike == True
+            )
+        )
+    ).on_conflict_do_nothing(index_elements=["userId1", "userId2"]).returning(Match.id).cte("new_match")
+    counted = likeCountersCte(currentUser.id, targetId, newSwipe, newMatch)
     
     try:
-        db.add(newSwipe)
-        db.commit()
-        db.refresh(newSwipe)
-    except Exception as e:
-        db.rollback()
+        await lockPairs(db, currentUser.id, [targetId])
+        found, swipeId, matchId = (await db.execute(select(
+            select(target.c.id).scalar_subquery(),
+            select(newSwipe.c.id).scalar_subquery(),
+            select(newMatch.c.id).scalar_subquery()
+        ).add_cte(unpooled, shrunk, counted))).one()
+        
+        if found is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        # Check if user has already liked this profile
+        if swipeId is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Already liked this profile"
+            )
+        
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("Like failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to record like"
         )
     
-    # Check for mutual like to create match
-    mutualSwipe = db.query(Swipe).filter(
-        Swipe.userId == targetId,
-        Swipe.targetId == currentUser.id,
-        Swipe.isLike == True
-    ).first()
-    
-    isMatch = False
-    matchId = None
-    
-    if mutualSwipe:
-        # Create match when both users have liked each other
-        newMatch = Match(
-            userId1=min(currentUser.id, targetId),  # Lower ID always first for consistency
-            userId2=max(currentUser.id, targetId)
+    recordLikes(currentUser.id, [targetId])
+    if matchId is not None:
+        publishEvent(
+            [currentUser.id, targetId],
+            {"type": "match", "matchId": matchId, "userIds": [userId1, userId2]}
         )
-        try:
-            db.add(newMatch)
-            db.commit()
-            db.refresh(newMatch)
-            
-            isMatch = True
-            matchId = newMatch.id
-        except Exception as e:
-            # If match creation fails, still return successful like
-            print(f"Match creation failed: {e}")
     
     return SwipeResponse(
-        id=newSwipe.id,
+        id=swipeId,
         targetId=targetId,
         isLike=True,
-        isMatch=isMatch,
+        isMatch=matchId is not None,
         matchId=matchId
     )
 
 @router.post("/pass")
 async def passProfile(
     targetId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Verify target user exists (basic validation)
-    targetUser = db.query(User).filter(
+    targetUser = (await db.execute(select(User.id).where(
         User.id == targetId,
         User.moderationStatus == "Approved"
-    ).first()
+    ))).first()
     
     if not targetUser:
         raise HTTPException(
@@ -128,61 +164,203 @@ async def passProfile(
             detail="Cannot pass your own profile"
         )
     
-    # NO database record is created for passes - just return success
-    # This ensures passes don't affect future recommendations
+    # Passes aren't stored in the database; discovery skips the profile until the cooldown ends
+    recordPasses(currentUser.id, [targetId])
     return {"message": "Profile passed", "action": "pass", "targetId": targetId}
 
+@router.post("/batch", response_model=List[SwipeBatchResult])
+async def swipeBatch(
+    batch: SwipeBatch,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    
+    # The first action per target wins; later ones in the same batch count as duplicates
+    firstActions = {}
+    for action in batch.actions:
+        firstActions.setdefault(action.targetId, action.isLike)
+    
+    # Validate every target with one query
+    targetIds = [targetId for targetId in firstActions if targetId != currentUser.id]
+    validIds = set()
+    if targetIds:
+        validIds = set((await db.scalars(select(User.id).where(
+            User.id.in_(targetIds),
+            User.moderationStatus == "Approved"
+        ))).all())
+    
+    likeIds = [targetId for targetId in targetIds if targetId in validIds and firstActions[targetId]]
+    recordPasses(currentUser.id, [targetId for targetId in targetIds if targetId in validIds and not firstActions[targetId]])
+    swipeIds = {}
+    matches = {}
+    
+    if likeIds:
+        try:
+            await lockPairs(db, currentUser.id, likeIds)
+            # Likes that already exist are skipped by the unique (userId, targetId) index;
+            # RETURNING only reports the rows actually inserted
+            inserted = await db.execute(pg_insert(Swipe).values([
+                {"userId": currentUser.id, "targetId": targetId, "isLike": True}
+                for targetId in likeIds
+            ]).on_conflict_do_nothing(index_elements=["userId", "targetId"]).returning(Swipe.id, Swipe.targetId))
+            swipeIds = {targetId: swipeId for swipeId, targetId in inserted.all()}
+            
+            if swipeIds:
+                # Liked profiles drop out of the liker's discovery pool
+                await db.run_sync(removeCandidates, currentUser.id, list(swipeIds))
+                
+                # Every new like that answers an existing like becomes a match, in one statement
+                mutual = select(
+                    func.least(Swipe.userId, Swipe.targetId),  # Lower ID always first for consistency
+                    func.greatest(Swipe.userId, Swipe.targetId)
+                ).where(
+                    Swipe.userId.in_(list(swipeIds)),
+                    Swipe.targetId == currentUser.id,
+                    Swipe.isLike == True
+                )
+                created = await db.execute(
+                    pg_insert(Match).from_select(["userId1", "userId2"], mutual)
+                    .on_conflict_do_nothing(index_elements=["userId1", "userId2"])
+                    .returning(Match.id, Match.userId1, Match.userId2)
+                )
+                for matchId, userId1, userId2 in created.all():
+                    matches[userId2 if userId1 == currentUser.id else userId1] = (matchId, userId1, userId2)
+                
+                # Stats counters for the liker and everyone they newly liked (utils/user_stats.py)
+                increments = {currentUser.id: {"likesSent": len(swipeIds), "matches": len(matches)}}
+                for targetId in swipeIds:
+                    increments[targetId] = {"likesReceived": 1, "matches": 1 if targetId in matches else 0}
+                await incrementStats(db, increments)
+            
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception("Batch swipe failed")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to record swipes"
+            )
+    
+    recordLikes(currentUser.id, swipeIds)
+    for targetId, (matchId, userId1, userId2) in matches.items():
+        publishEvent(
+            [currentUser.id, targetId],
+            {"type": "match", "matchId": matchId, "userIds": [userId1, userId2]}
+        )
+    
+    # One result per submitted action, in order
+    results = []
+    seen = set()
+    for action in batch.actions:
+        targetId = action.targetId
+        result = SwipeBatchResult(targetId=targetId, isLike=action.isLike, status="duplicate")
+        if targetId in seen:
+            pass
+        elif targetId not in validIds:
+            result.status = "invalid"
+        elif not action.isLike:
+            # Recorded in utils/passes.py, same as /pass
+            result.status = "passed"
+        elif targetId in swipeIds:
+            result.status = "liked"
+            result.id = swipeIds[targetId]
+            if targetId in matches:
+                result.isMatch = True
+                result.matchId = matches[targetId][0]
+        seen.add(targetId)
+        results.append(result)
+    
+    return results
+
 @router.get("/matches", response_model=List[MatchResponse])
 async def getMatches(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db)
 ):
   
-    # Find all matches where current user is either user1 or user2
-    matches = db.query(Match).filter(
-        (Match.userId1 == currentUser.id) | (Match.userId2 == currentUser.id)
-    ).order_by(Match.createdAt.desc()).all()
+    # The "other" user is whichever side of the match isn't the current user
+    otherUserId = case(
+        (Match.userId1 == currentUser.id, Match.userId2),
+        else_=Match.userId1
+    )
     
-    result = []
-    for match in matches:
-        # Determine which user is the "other" user in the match
-        otherUserId = match.userId2 if match.userId1 == currentUser.id else match.userId1
-        otherUser = db.query(User).filter(
+    # One query for the page of matches and the other users' card versions; the users
+    # themselves come from the profile card cache (utils/profile_cards.py)
+    query = select(Match.id, Match.createdAt, User.id, User.profileVersion).join(
+        User,
+        and_(
             User.id == otherUserId,
             User.moderationStatus == "Approved"  # Only show matches with approved users
-        ).first()
-        
-        if otherUser:
-            result.append(MatchResponse(
-                id=match.id,
-                createdAt=match.createdAt,
-                user=otherUser
-            ))
-    
-    return result
+        )
+    ).where(
+        (Match.userId1 == currentUser.id) | (Match.userId2 == currentUser.id)
+    )
+    
+    # Newest first, keyset on (createdAt, id)
+    after = decodeCursor(cursor)
+    if after is not None:
+        try:
+            afterCreatedAt = datetime.fromisoformat(after["t"])
+            afterId = int(after["i"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        query = query.where(tuple_(Match.createdAt, Match.id) < tuple_(afterCreatedAt, afterId))
+    
+    rows = (await db.execute(query.order_by(Match.createdAt.desc(), Match.id.desc()).limit(limit))).all()
+    
+    headers = {}
+    if len(rows) == limit:
+        lastId, lastCreatedAt = rows[-1][:2]
+        headers["X-Next-Cursor"] = encodeCursor({
+            "t": lastCreatedAt.isoformat(),
+            "i": lastId
+        })
+    
+    # MatchResponse JSON built around each cached card; a user deleted meanwhile drops out
+    cards = await profileCardMap(db, [(userId, version) for _, _, userId, version in rows], UserCard)
+    matches = []
+    for matchId, createdAt, userId, version in rows:
+        card = cards.get((userId, version))
+        if card is not None:
+            matches.append(b'{"id":' + to_json(matchId) + b',"createdAt":' + to_json(createdAt) + b',"user":' + card + b'}')
+    
+    return cardListResponse(matches, headers)
 
 @router.get("/sentLikes", response_model=List[int])
 async def getSentLikes(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db)
 ):
 
-    likes = db.query(Swipe.targetId).filter(
+    cached = likedIds(currentUser.id)
+    if cached is not None:
+        return cached.tolist()
+    
+    likes = await db.scalars(select(Swipe.targetId).where(
         Swipe.userId == currentUser.id,
         Swipe.isLike == True
-    ).all()
+    ))
     
-    return [like.targetId for like in likes]
+    return likes.all()
 
 @router.get("/receivedLikes", response_model=List[int])
 async def getReceivedLikes(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db)
 ):
 
-    likes = db.query(Swipe.userId).filter(
+    cached = likedByIds(currentUser.id)
+    if cached is not None:
+        return cached.tolist()
+    
+    likes = await db.scalars(select(Swipe.userId).where(
         Swipe.targetId == currentUser.id,
         Swipe.isLike == True
-    ).all()
+    ))
     
-    return [like.userId for like in likes] 
\ No newline at end of file
+    return likes.all() 
\ No newline at end of file
@@ -1,38 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, func
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy import or_, and_, desc, func, case, select, true, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, asyncSession
 from models.user import User
 from models.match import Match
 from models.message import Conversation, Message
 from schemas.message import MessageCreate, MessageResponse, ConversationCreate, ConversationSummary, ConversationDetail
-from utils.jwt_auth import getCurrentUser
-from typing import List
+from utils.jwt_auth import getCurrentPrincipal, Principal, verifyToken
+from utils.realtime import manager, publishEvent
+from utils.pagination import encodeCursor, decodeCursor
+from utils.read_routing import get_read_db
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter(tags=["Messages"])
 
+MESSAGE_PAGE_SIZE = 50
+
 @router.post("/conversations", response_model=ConversationDetail)
 async def createConversation(
     conversation: ConversationCreate,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if target user exists 
-    targetUser = db.query(User).filter(
+    targetUser = (await db.execute(select(User.id).where(
         User.id == conversation.userId2,
         User.moderationStatus == "Approved"
-    ).first()
+    ))).first()
     
     if not targetUser:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     # Check if users are matched
-    isMatched = db.query(Match).filter(
+    isMatched = (await db.execute(select(Match.id).where(
         or_(
             and_(Match.userId1 == currentUser.id, Match.userId2 == conversation.userId2),
             and_(Match.userId1 == conversation.userId2, Match.userId2 == currentUser.id)
         )
-    ).first() is not None
+    ))).first() is not None
     
     if not isMatched:
         raise HTTPException(
@@ -45,43 +53,42 @@ async def createConversation(
     userId2 = max(currentUser.id, conversation.userId2)
     
     # Check if conversation already exists
-    existingConversation = db.query(Conversation).filter(
+    existingConversation = (await db.execute(select(Conversation.id).where(
         Conversation.userId1 == userId1,
         Conversation.userId2 == userId2
-    ).first()
+    ))).first()
     
     if existingConversation:
-        return getConversationDetail(existingConversation.id, currentUser, db)
+        return await getConversationDetail(existingConversation.id, currentUser, db)
     
     # If it doesn't exist, create a new conversation
     newConversation = Conversation(userId1=userId1, userId2=userId2)
     
     try:
         db.add(newConversation)
-        db.commit()
-        db.refresh(newConversation)
-        return getConversationDetail(newConversation.id, currentUser, db)
+        await db.commit()
+        return await getConversationDetail(newConversation.id, currentUser, db)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create conversation: {str(e)}")
     
 # Gets details/summary of a specific conversation
 @router.get("/conversations/{conversationId}", response_model=ConversationDetail)
 async def getConversation(
     conversationId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return getConversationDetail(conversationId, currentUser, db)
+    return await getConversationDetail(conversationId, currentUser, db)
 
-def getConversationDetail(conversationId, currentUser, db):
-    conversation = db.query(Conversation).filter(
+async def getConversationDetail(conversationId, currentUser, db):
+    conversation = (await db.execute(select(Conversation).where(
         Conversation.id == conversationId,
         or_(
             Conversation.userId1 == currentUser.id,
             Conversation.userId2 == currentUser.id
         )
-    ).first()
+    ))).scalars().first()
     
     if not conversation:
         raise HTTPException(
@@ -90,7 +97,7 @@ def getConversationDetail(conversationId, currentUser, db):
         )
     
     otherUserId = conversation.userId2 if conversation.userId1 == currentUser.id else conversation.userId1
-    otherUser = db.query(User).filter(User.id == otherUserId).first()
+    otherUser = await db.get(User, otherUserId)
     
     if not otherUser:
         raise HTTPException(
@@ -98,19 +105,14 @@ def getConversationDetail(conversationId, currentUser, db):
             detail="Other participant not found"
         )
     
-    messages = db.query(Message).filter(
-        Message.conversationId == conversationId
-    ).order_by(Message.createdAt.asc()).all()
+    # Only the newest page; older history comes from GET /conversations/{id}/messages
+    messages, messagesCursor = await fetchMessagePage(db, conversationId, MESSAGE_PAGE_SIZE)
     
-    unreadCount = db.query(func.count(Message.id)).filter(
+    unreadCount = await db.scalar(select(func.count(Message.id)).where(
         Message.conversationId == conversationId,
         Message.senderId != currentUser.id,
         Message.isRead == False
-    ).scalar()
-    
-    lastMessage = db.query(Message).filter(
-        Message.conversationId == conversationId
-    ).order_by(Message.createdAt.desc()).first()
+    ))
     
     return ConversationDetail(
         id=conversation.id,
@@ -119,46 +121,111 @@ def getConversationDetail(conversationId, currentUser, db):
         lastMessageAt=conversation.lastMessageAt,
         createdAt=conversation.createdAt,
         messages=messages,
-        lastMessage=lastMessage,
+        messagesCursor=messagesCursor,
+        lastMessage=messages[-1] if messages else None,
         otherUser=otherUser,
         unreadCount=unreadCount
     )
 
+async def fetchMessagePage(db, conversationId, limit, before=None):
+    # Newest-first keyset walk on (createdAt, id), returned oldest-first for display
+    query = select(Message).where(Message.conversationId == conversationId)
+    
+    after = decodeCursor(before)
+    if after is not None:
+        try:
+            beforeCreatedAt = datetime.fromisoformat(after["t"])
+            beforeId = int(after["i"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        query = query.where(tuple_(Message.createdAt, Message.id) < tuple_(beforeCreatedAt, beforeId))
+    
+    messages = (await db.scalars(query.order_by(Message.createdAt.desc(), Message.id.desc()).limit(limit))).all()
+    messages.reverse()
+    
+    nextCursor = None
+    if len(messages) == limit:
+        nextCursor = encodeCursor({"t": messages[0].createdAt.isoformat(), "i": messages[0].id})
+    return messages, nextCursor
+
+# Message history, newest page first; pass the returned cursor as `before` for older messages
+@router.get("/conversations/{conversationId}/messages", response_model=List[MessageResponse])
+async def getMessages(
+    conversationId: int,
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=100),
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    isParticipant = (await db.execute(select(Conversation.id).where(
+        Conversation.id == conversationId,
+        or_(
+            Conversation.userId1 == currentUser.id,
+            Conversation.userId2 == currentUser.id
+        )
+    ))).first() is not None
+    
+    if not isParticipant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found or you're not a participant"
+        )
+    
+    messages, nextCursor = await fetchMessagePage(db, conversationId, limit, before)
+    if nextCursor:
+        response.headers["X-Next-Cursor"] = nextCursor
+    return messages
+
 # Gets list of conversations for current user
 @router.get("/conversations", response_model=List[ConversationSummary])
 async def listConversations(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db),
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db),
     skip: int = 0,
     limit: int = 20):  
-    conversations = db.query(Conversation).filter(
+    otherUserId = case(
+        (Conversation.userId1 == currentUser.id, Conversation.userId2),
+        else_=Conversation.userId1
+    )
+    
+    # Latest message per conversation via LATERAL, unread count as a correlated count,
+    # so the whole page (other user included) comes back in one query
+    lastMessageSubquery = select(Message).where(
+        Message.conversationId == Conversation.id
+    ).order_by(Message.createdAt.desc(), Message.id.desc()).limit(1).lateral("lastMessage")
+    LastMessage = aliased(Message, lastMessageSubquery)
+    
+    unreadCount = select(func.count(Message.id)).where(
+        Message.conversationId == Conversation.id,
+        Message.senderId != currentUser.id,
+        Message.isRead == False
+    ).correlate(Conversation).scalar_subquery()
+    
+    rows = (await db.execute(select(Conversation, User, LastMessage, unreadCount.label("unreadCount")).join(
+        User, User.id == otherUserId
+    ).outerjoin(LastMessage, true()).options(selectinload(User.images)).where(
         or_(
             Conversation.userId1 == currentUser.id,
             Conversation.userId2 == currentUser.id
         )
-    ).order_by(Conversation.lastMessageAt.desc()).offset(skip).limit(limit).all()
-    result = []
-    for convo in conversations:
-        otherUserId = convo.userId2 if convo.userId1 == currentUser.id else convo.userId1
-        otherUser = db.query(User).filter(User.id == otherUserId).first()
-        if otherUser:
-            lastMessage = db.query(Message).filter(
-                Message.conversationId == convo.id).order_by(Message.createdAt.desc()).first()
-            unreadCount = db.query(func.count(Message.id)).filter(
-                Message.conversationId == convo.id,
-                Message.senderId != currentUser.id,
-                Message.isRead == False
-            ).scalar()
-            result.append(ConversationSummary(
-                id=convo.id,
-                userId1=convo.userId1,
-                userId2=convo.userId2,
-                lastMessageAt=convo.lastMessageAt,
-                createdAt=convo.createdAt,
-                lastMessage=lastMessage,
-                otherUser=otherUser,
-                unreadCount=unreadCount))
-    return result
+    ).order_by(Conversation.lastMessageAt.desc()).offset(skip).limit(limit))).all()
+    
+    return [
+        ConversationSummary(
+            id=convo.id,
+            userId1=convo.userId1,
+            userId2=convo.userId2,
+            lastMessageAt=convo.lastMessageAt,
+            createdAt=convo.createdAt,
+            lastMessage=lastMessage,
+            otherUser=otherUser,
+            unreadCount=unread)
+        for convo, otherUser, lastMessage, unread in rows
+    ]
 
 
 # Send a message
@@ -166,18 +233,18 @@ async def listConversations(
 async def sendMessage(
     conversationId: int,
     message: MessageCreate,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Check if conversation exists and if user is a participant
-    conversation = db.query(Conversation).filter(
+    conversation = (await db.execute(select(Conversation).where(
         Conversation.id == conversationId,
         or_(
             Conversation.userId1 == currentUser.id,
             Conversation.userId2 == currentUser.id
         )
-    ).first()
+    ))).scalars().first()
     
     if not conversation:
         raise HTTPException(
@@ -197,11 +264,15 @@ async def sendMessage(
         db.add(newMessage)
         # Update conversation's lastMessageAt
         conversation.lastMessageAt = func.now()
-        db.commit()
-        db.refresh(newMessage)
+        await db.commit()
+        await db.refresh(newMessage)
+        publishEvent(
+            [conversation.userId1, conversation.userId2],
+            {"type": "message", "message": jsonable_encoder(MessageResponse.model_validate(newMessage))}
+        )
         return newMessage
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to send message"
@@ -211,20 +282,20 @@ async def sendMessage(
 @router.put("/conversations/{conversationId}/read")
 async def markConversationAsRead(
     conversationId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Check if conversation exists and if user is a participant
     # Honestly I should probably make this a separate function this is getting
     # repetitive -- note to self lol
-    conversation = db.query(Conversation).filter(
+    conversation = (await db.execute(select(Conversation).where(
         Conversation.id == conversationId,
         or_(
             Conversation.userId1 == currentUser.id,
             Conversation.userId2 == currentUser.id
         )
-    ).first()
+    ))).scalars().first()
     
     if not conversation:
         raise HTTPException(
@@ -234,18 +305,49 @@ async def markConversationAsRead(
     
     try:
         # Mark all messages from the other user as read
-        db.query(Message).filter(
+        await db.execute(update(Message).where(
             Message.conversationId == conversationId,
             Message.senderId != currentUser.id,
             Message.isRead == False
-        ).update({"isRead": True})
+        ).values(isRead=True))
         
-        db.commit()
+        await db.commit()
+        # Read receipt for the other participant
+        otherUserId = conversation.userId2 if conversation.userId1 == currentUser.id else conversation.userId1
+        publishEvent(
+            [otherUserId],
+            {"type": "read", "conversationId": conversationId, "readerId": currentUser.id}
+        )
         return {"message": "All messages marked as read"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to mark messages as read"
         )
+
+# Push channel for new messages, read receipts and new matches.
+# Browsers can't set headers on a WebSocket, so the JWT comes as ?token=
+@router.websocket("/ws")
+async def messagesWebSocket(websocket: WebSocket, token: str = Query(...)):
+    email = verifyToken(token)
+    userId = None
+    if email is not None:
+        async with asyncSession() as db:
+            userId = await db.scalar(select(User.id).where(User.email == email))
     
+    if userId is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    manager.connect(userId, websocket)
+    try:
+        while True:
+            # Clients only send keepalives; everything else flows server -> client
+            if await websocket.receive_text() == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(userId, websocket)
@@ -1,19 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.user import User
 from schemas.user import UserResponse, UserProfileUpdate, UserPreferencesUpdate
-from utils.jwt_auth import getCurrentUser
+from utils.jwt_auth import getCurrentPrincipal, Principal
+from utils.candidate_pool import refreshChangedUser, removeUser
+from utils.user_cache import invalidateCachedUser
+from utils.passes import clearPasses
+from utils.swipe_graph import forgetUser
+from utils.read_routing import get_read_db
+from utils.profile_cards import bumpProfileVersion, profileCard
+from utils.http_cache import conditionalResponse
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(tags=["Profile"])
 
+def applyUpdate(user: User, updateData: dict) -> set:
+    # Sets the given fields and returns the ones whose value actually changed
+    changed = set()
+    for field, value in updateData.items():
+        if hasattr(user, field) and getattr(user, field) != value:
+            setattr(user, field, value)
+            changed.add(field)
+    return changed
+
 @router.get("/me", response_model=UserResponse)
 async def getCurrentUserProfile(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).options(joinedload(User.images)).filter(User.id == currentUser.id).first()
+    user = await db.get(User, currentUser.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
@@ -21,12 +38,12 @@ async def getCurrentUserProfile(
 @router.put("/update", response_model=UserResponse)
 async def updateProfile(
     profileData: UserProfileUpdate,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get current user from database to ensure fresh data
-    user = db.query(User).filter(User.id == currentUser.id).first()
+    user = await db.get(User, currentUser.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,18 +53,22 @@ async def updateProfile(
     # Update only provided fields (exclude_none in schema handles this)
     updateData = profileData.dict(exclude_none=True)
     
-    for field, value in updateData.items():
-        if hasattr(user, field):
-            setattr(user, field, value)
+    changed = applyUpdate(user, updateData)
+    if not changed:
+        return user
     
     try:
-        db.commit()
-        db.refresh(user)
-        # Return with images eager loaded
-        user_with_images = db.query(User).options(joinedload(User.images)).filter(User.id == user.id).first()
-        return user_with_images
+        # New card version; cached cards of the old one are never served again
+        await bumpProfileVersion(db, user.id)
+        # Discovery pools only depend on the filtered and ranked fields (utils/candidate_pool.py)
+        await db.run_sync(refreshChangedUser, user.id, changed)
+        await db.commit()
+        invalidateCachedUser(user.email)
+        # Images come back with the refresh (User.images is selectin-loaded)
+        await db.refresh(user)
+        return user
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Profile update error: {e}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,12 +78,12 @@ async def updateProfile(
 @router.put("/preferences", response_model=UserResponse)
 async def updatePreferences(
     preferencesData: UserPreferencesUpdate,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get current user from database
-    user = db.query(User).filter(User.id == currentUser.id).first()
+    user = await db.get(User, currentUser.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,17 +93,21 @@ async def updatePreferences(
     # Update preference fields
     updateData = preferencesData.dict(exclude_none=True)
     
-    for field, value in updateData.items():
-        if hasattr(user, field):
-            setattr(user, field, value)
+    changed = applyUpdate(user, updateData)
+    if not changed:
+        return user
     
     try:
-        db.commit()
-        db.refresh(user)
-        user_with_images = db.query(User).options(joinedload(User.images)).filter(User.id == user.id).first()
-        return user_with_images
+        # New card version; cached cards of the old one are never served again
+        await bumpProfileVersion(db, user.id)
+        # Discovery pools only depend on the filtered and ranked fields (utils/candidate_pool.py)
+        await db.run_sync(refreshChangedUser, user.id, changed)
+        await db.commit()
+        invalidateCachedUser(user.email)
+        await db.refresh(user)
+        return user
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Preferences update error: {e}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -92,38 +117,47 @@ async def updatePreferences(
 @router.get("/viewProfile/{userId}", response_model=UserResponse)
 async def viewOtherUserProfile(
     userId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    request: Request,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db)
 ):
     
-    # Find the user profile
-    user = db.query(User).options(joinedload(User.images)).filter(
+    # Find the user profile; the body is its cached card (utils/profile_cards.py)
+    ref = (await db.execute(select(User.id, User.profileVersion).where(
         User.id == userId,
         User.moderationStatus == "Approved"
-    ).first()
+    ))).first()
     
-    if not user:
+    if not ref:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
     
-    if user.id == currentUser.id:
+    if ref.id == currentUser.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Use /me endpoint to view your own profile"
         )
     
-    return user
+    card = await profileCard(db, tuple(ref))
+    if card is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    # ETag + 304 when the client already has this card
+    return conditionalResponse(request, card)
 
 @router.delete("/delete")
 async def deleteProfile(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     # Get current user from database
-    user = db.query(User).filter(User.id == currentUser.id).first()
+    user = await db.get(User, currentUser.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -132,12 +166,16 @@ async def deleteProfile(
     
     try:
         # SQLAlchemy cascade deletions will handle related records (images, swipes, matches)
-        db.delete(user)
-        db.commit()
+        await db.run_sync(removeUser, user.id)
+        await db.delete(user)
+        await db.commit()
+        invalidateCachedUser(user.email)
+        clearPasses(user.id)
+        forgetUser(user.id)
         
         return {"message": "Profile deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Profile deletion error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,141 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, not_
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import not_, func, tuple_, literal, select, update, all_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.user import User
 from models.swipe import Swipe
-from models.match import Match
-from schemas.user import UserResponse
-from utils.jwt_auth import getCurrentUser
-from typing import List
-import random
+from models.candidate_pool import CandidatePool, CandidatePoolState
+from models.user_stats import UserStats
+from schemas.user import UserResponse, UserCard
+from utils.jwt_auth import getCurrentUser, getCurrentPrincipal, Principal
+from utils.pagination import encodeCursor, decodeCursor
+from utils.candidate_pool import ensureViewerPool, poolQuery
+from utils.read_routing import get_read_db, markRecentWrite
+from utils.passes import recentPasses
+from utils.swipe_graph import hasLiked, likedIds
+from utils.user_stats import reconcileStats, STATS_RECONCILE_SECONDS
+from utils.profile_cards import profileCards, profileCard, cardListResponse
+from utils.http_cache import conditionalResponse
+from typing import List, Optional
+import os
+import orjson
+import secrets
+from datetime import timedelta
 
 router = APIRouter(tags=["Recommendations"])
 
-@router.get("/discover", response_model=List[UserResponse])
+# profilesAvailable is counted exactly up to this many candidates; bigger pools report the
+# size stored on CandidatePoolState, recounted once it is older than POOL_COUNT_MAX_AGE seconds
+POOL_COUNT_EXACT_LIMIT = int(os.getenv('POOL_COUNT_EXACT_LIMIT', 1000))
+POOL_COUNT_MAX_AGE = int(os.getenv('POOL_COUNT_MAX_AGE', 3600))
+
+def shuffleKey(viewerId: int, seed: int):
+    # Deterministic per-viewer shuffle computed by Postgres: same seed -> same order,
+    # so pages can be walked with a keyset cursor instead of OFFSET
+    return func.md5(func.concat(viewerId, ":", seed, ":", User.id))
+
+def poolOrder():
+    # Best score first (utils/ranking.py), the pair's stored shuffle key among equal scores, candidate id
+    # as the final tiebreak. These are exactly the columns of idx_candidate_pool_viewer_rank, so a page
+    # is an index range scan that reads `limit` rows whatever the pool size
+    return [-CandidatePool.score, CandidatePool.shuffleKey, CandidatePool.candidateId]
+
+def fallbackOrder(viewerId: int, seed: int):
+    # Unscored, seeded shuffle. Nothing indexes the md5 key, so every fallback page hashes and sorts
+    # all eligible users (a top-N sort: O(n log limit) over the approved users)
+    return [shuffleKey(viewerId, seed), User.id]
+
+def rankedPageQuery(query, orderKeys, limit: int, after=None):
+    # Keys all ascending (the score is negated), so the keyset is one row comparison;
+    # after holds the last row's values of these keys
+    if after is not None:
+        query = query.where(tuple_(*orderKeys) > tuple_(*after))
+    
+    return query.add_columns(*orderKeys).order_by(*orderKeys).limit(limit)
+
+def discoveryStatsQuery(viewerId: int):
+    # Capped pool count, stored pool size (if counted lately), the stats row and whether it is fresh
+    cappedCount = select(func.count()).select_from(
+        select(CandidatePool.candidateId).where(
+            CandidatePool.viewerId == viewerId
+        ).limit(POOL_COUNT_EXACT_LIMIT + 1).subquery()
+    ).scalar_subquery()
+    storedPoolSize = select(CandidatePoolState.poolSize).where(
+        CandidatePoolState.userId == viewerId,
+        CandidatePoolState.countedAt > func.now() - timedelta(seconds=POOL_COUNT_MAX_AGE)
+    ).scalar_subquery()
+    statsFresh = UserStats.reconciledAt > func.now() - timedelta(seconds=STATS_RECONCILE_SECONDS)
+    return select(cappedCount, storedPoolSize, UserStats, statsFresh).select_from(
+        select(literal(1)).subquery()
+    ).outerjoin(UserStats, UserStats.userId == viewerId)
+
+async def viewerPoolSession(db: AsyncSession, primary: AsyncSession, currentUser: Principal) -> AsyncSession:
+    # Pools are built lazily, and only the primary can build one; until the replica
+    # has the new pool, read it back from the primary
+    if await db.get(CandidatePoolState, currentUser.id) is not None:
+        return db
+    await primary.run_sync(ensureViewerPool, currentUser.id)
+    markRecentWrite(currentUser.email)
+    return primary
+
+def excludeIds(query, userIds):
+    # One array parameter, so the page query needs no extra join however many IDs there are
+    if not userIds:
+        return query
+    return query.where(User.id != all_(literal(sorted(userIds), ARRAY(Integer))))
+
+async def fetchRankedPage(db: AsyncSession, query, viewerId: int, orderKeys, limit: int, after=None):
+    # Recently passed profiles come from Redis (utils/passes.py). Only (id, profileVersion) is read;
+    # the profiles themselves are cached cards (utils/profile_cards.py)
+    query = excludeIds(query, recentPasses(viewerId)).with_only_columns(User.id, User.profileVersion)
+    rows = (await db.execute(rankedPageQuery(query, orderKeys, limit, after))).all()
+    return [(row[0], row[1]) for row in rows], (tuple(rows[-1][2:]) if rows else None)
+
+@router.get("/discover", response_model=List[UserCard])
 async def getRecommendations(
-    limit: int = 20,
-    offset: int = 0,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_async_db)
 ):
     
-    # Get users that current user has already liked 
-    likedUserIds = db.query(Swipe.targetId).filter(
-        Swipe.userId == currentUser.id,
-        Swipe.isLike == True
-    ).subquery()
-    
-    # Base query for recommendations 
-    query = db.query(User).filter(
-        User.id != currentUser.id,
-        User.moderationStatus == "Approved",
-        not_(User.id.in_(likedUserIds))
-    )
-    
-    preferenceFilters = []
-    
-    
-    if currentUser.genderPref and currentUser.genderPref != "Everyone":
-        preferenceFilters.append(User.gender == currentUser.genderPref)  # already normalized via schema
-    
-    if currentUser.minAge and currentUser.maxAge:
-        preferenceFilters.append(
-            and_(
-                User.age >= currentUser.minAge,
-                User.age <= currentUser.maxAge
-            )
-        )
-    
-    if currentUser.otherColleges and len(currentUser.otherColleges) > 0:
-        collegeFilter = or_(
-            User.college == currentUser.college,
-            User.otherColleges.contains([currentUser.college])
-        )
-        preferenceFilters.append(collegeFilter)
+    # The cursor pins the shuffle seed, the last order keys seen ((-score, shuffle key, id) in the pool,
+    # (md5 key, id) in the unscored fallback), and whether this session already dropped to the
+    # fallback pool so every page walks the same ordering
+    state = decodeCursor(cursor)
+    if state is None:
+        seed = secrets.randbelow(2**31)
+        after, useFallback = None, False
     else:
-        preferenceFilters.append(User.college == currentUser.college)
-    
-    if currentUser.majors and len(currentUser.majors) > 0:
-        # Match if the other user's majors overlaps with current user's preferred majors
-        preferenceFilters.append(User.majors.overlap(currentUser.majors))
-    
-    if preferenceFilters:
-        query = query.filter(and_(*preferenceFilters))
-    
-    mutualCompatibilityFilters = []
-    
-    mutualCompatibilityFilters.append(
-        or_(
-            User.genderPref == "Everyone",
-            User.genderPref == currentUser.gender,
-            User.genderPref.is_(None)  
-        )
-    )
-    
-    mutualCompatibilityFilters.append(
-        and_(
-            or_(User.minAge.is_(None), User.minAge <= currentUser.age),
-            or_(User.maxAge.is_(None), User.maxAge >= currentUser.age)
-        )
-    )
-    
-    mutualCompatibilityFilters.append(
-        or_(
-            User.college == currentUser.college,  
-            User.otherColleges.contains([currentUser.college]),  
-            User.otherColleges == []  
-        )
-    )
-    
-    query = query.filter(and_(*mutualCompatibilityFilters))
+        try:
+            seed = int(state["s"])
+            useFallback = bool(state.get("f", False))
+            keys = state["k"]
+            if not isinstance(keys, list) or len(keys) != (2 if useFallback else 3):
+                raise ValueError("cursor keys")
+            if useFallback:
+                after = (str(keys[0]), int(keys[1]))
+            else:
+                after = (float(keys[0]), int(keys[1]), int(keys[2]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
     
-    allMatchingUsers = query.all()
-
-    # Fallback: if strict filters yield no results, return broader pool
-    if not allMatchingUsers:
-        fallbackQuery = db.query(User).filter(
+    pageRefs, last = [], None
+    if not useFallback:
+        # Compatibility filtering, already-liked exclusion and scoring are precomputed in the pool
+        db = await viewerPoolSession(db, primary, currentUser)
+        query = poolQuery(currentUser.id)
+        pageRefs, last = await fetchRankedPage(db, query, currentUser.id, poolOrder(), limit, after)
+        
+        # Fallback: if strict filters yield no results, return broader pool
+        if not pageRefs and cursor is None:
+            useFallback = True
+    
+    if useFallback:
+        fallbackQuery = select(User).where(
             User.id != currentUser.id,
-            User.moderationStatus == "Approved",
-            not_(User.id.in_(likedUserIds))
+            User.moderationStatus == "Approved"
         )
-        allMatchingUsers = fallbackQuery.all()
-    
-    random.shuffle(allMatchingUsers)
-    
-    paginatedUsers = allMatchingUsers[offset:offset + limit]
-    
-    return paginatedUsers
+        # Liked profiles come from the in-memory swipe graph when it's loaded
+        liked = likedIds(currentUser.id)
+        if liked is not None:
+            fallbackQuery = excludeIds(fallbackQuery, liked)
+        else:
+            fallbackQuery = fallbackQuery.where(not_(User.id.in_(select(Swipe.targetId).where(
+                Swipe.userId == currentUser.id,
+                Swipe.isLike == True
+            ))))
+        pageRefs, last = await fetchRankedPage(db, fallbackQuery, currentUser.id, fallbackOrder(currentUser.id, seed), limit, after)
+    
+    headers = {}
+    if len(pageRefs) == limit:
+        headers["X-Next-Cursor"] = encodeCursor({
+            "s": seed,
+            "k": list(last),
+            "f": useFallback
+        })
+    
+    return cardListResponse(await profileCards(db, pageRefs, UserCard), headers)
 
 @router.get("/profile/{userId}", response_model=UserResponse)
 async def getProfileById(
     userId: int,
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    request: Request,
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db)
 ):
     
-    user = db.query(User).filter(
+    ref = (await db.execute(select(User.id, User.profileVersion).where(
         User.id == userId,
         User.moderationStatus == "Approved"
-    ).first()
+    ))).first()
     
-    if not user:
+    if not ref:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
     
-    if user.id == currentUser.id:
+    if ref.id == currentUser.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Use /profile/me endpoint to view your own profile"
         )
     
-    existingLike = db.query(Swipe).filter(
-        Swipe.userId == currentUser.id,
-        Swipe.targetId == userId,
-        Swipe.isLike == True
-    ).first()
+    existingLike = hasLiked(currentUser.id, userId)
+    if existingLike is None:
+        existingLike = (await db.execute(select(Swipe.id).where(
+            Swipe.userId == currentUser.id,
+            Swipe.targetId == userId,
+            Swipe.isLike == True
+        ))).first() is not None
     
     if existingLike:
         raise HTTPException(
@@ -143,82 +202,63 @@ async def getProfileById(
             detail="Already liked this profile"
         )
     
-    return user
+    card = await profileCard(db, tuple(ref))
+    if card is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    return conditionalResponse(request, card)
 
 @router.get("/stats")
 async def getDiscoveryStats(
-    currentUser: User = Depends(getCurrentUser),
-    db: Session = Depends(get_db)
+    currentUser: Principal = Depends(getCurrentPrincipal),
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_async_db)
 ):
     
-    # Get users that current user has already liked 
-    likedUserIds = db.query(Swipe.targetId).filter(
-        Swipe.userId == currentUser.id,
-        Swipe.isLike == True
-    ).subquery()
-    
-    availableQuery = db.query(User).filter(
-        User.id != currentUser.id,
-        User.moderationStatus == "Approved",
-        not_(User.id.in_(likedUserIds))
-    )
-    
-    if currentUser.genderPref and currentUser.genderPref != "Everyone":
-        availableQuery = availableQuery.filter(User.gender == currentUser.genderPref)
-    
-    if currentUser.minAge and currentUser.maxAge:
-        availableQuery = availableQuery.filter(
-            and_(
-                User.age >= currentUser.minAge,
-                User.age <= currentUser.maxAge
-            )
-        )
-    
-    if currentUser.otherColleges and len(currentUser.otherColleges) > 0:
-        collegeFilter = or_(
-            User.college == currentUser.college,
-            User.otherColleges.contains([currentUser.college])
-        )
-        availableQuery = availableQuery.filter(collegeFilter)
-    else:
-        availableQuery = availableQuery.filter(User.college == currentUser.college)
-    
-    totalAvailable = availableQuery.count()
-    
-    totalLikes = db.query(Swipe).filter(
-        Swipe.userId == currentUser.id,
-        Swipe.isLike == True
-    ).count()
-    
-    likesReceived = db.query(Swipe).filter(
-        Swipe.targetId == currentUser.id,
-        Swipe.isLike == True
-    ).count()
-    
-    totalMatches = db.query(Match).filter(
-        or_(
-            Match.userId1 == currentUser.id,
-            Match.userId2 == currentUser.id
-        )
-    ).count()
+    # One round trip: the user's like/match counters (utils/user_stats.py) and the pool size
+    db = await viewerPoolSession(db, primary, currentUser)
+    totalAvailable, poolSize, stats, fresh = (await db.execute(discoveryStatsQuery(currentUser.id))).one()
+    
+    # Exact up to POOL_COUNT_EXACT_LIMIT (the count stops there); above it, the stored size.
+    # See README "Stats" for its error bound
+    approximate = totalAvailable > POOL_COUNT_EXACT_LIMIT
+    if approximate:
+        if poolSize is None:
+            totalAvailable = await db.scalar(select(func.count()).where(CandidatePool.viewerId == currentUser.id))
+            await primary.execute(update(CandidatePoolState).where(
+                CandidatePoolState.userId == currentUser.id
+            ).values(poolSize=totalAvailable, countedAt=func.now()))
+            await primary.commit()
+        else:
+            # Can't be below what the capped count just saw
+            totalAvailable = max(poolSize, POOL_COUNT_EXACT_LIMIT + 1)
+    
+    if stats is None or not fresh:
+        # Missing or not recounted lately: recount from swipes/matches on the primary
+        stats = await reconcileStats(primary, currentUser.id)
     
     return {
         "profilesAvailable": totalAvailable,
-        "totalLikes": totalLikes,
-        "likesReceived": likesReceived,
-        "totalMatches": totalMatches,
-        "profilesLiked": totalLikes  
+        "profilesAvailableApproximate": approximate,
+        "totalLikes": stats.likesSent,
+        "likesReceived": stats.likesReceived,
+        "totalMatches": stats.matches,
+        "profilesLiked": stats.likesSent  
     }
 
 @router.get("/filters")
 async def getRecommendationFilters(
+    request: Request,
     currentUser: User = Depends(getCurrentUser)
 ):
-    return {
+    return conditionalResponse(request, orjson.dumps({
         "genderPref": currentUser.genderPref,
         "minAge": currentUser.minAge,
         "maxAge": currentUser.maxAge,
         "college": currentUser.college,
         "otherColleges": currentUser.otherColleges,
         "majors": currentUser.majors
-    } 
\ No newline at end of file
+    })) 
\ No newline at end of file
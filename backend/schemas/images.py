@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
 from models.images import Image
+from utils.storage import storageUrl
 
 # Base image schema
 class ImageBase(BaseModel):
@@ -24,8 +25,17 @@ class ImageResponse(ImageBase):
     id: int
     userId: int
     imageUrl: str # URL/path to the image file
+    smallUrl: Optional[str] = None # 200px WebP variant
+    mediumUrl: Optional[str] = None # 600px WebP variant
+    largeUrl: Optional[str] = None # 1200px WebP variant
     isPrimary: bool # Whether this is the user's main profile picture
     createdAt: datetime # When image was uploaded
     
+    # The database holds storage keys; clients get a servable (CDN or presigned) URL
+    @field_validator("imageUrl", "smallUrl", "mediumUrl", "largeUrl")
+    @classmethod
+    def toStorageUrl(cls, value):
+        return storageUrl(value)
+    
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from .user import UserResponse
+from .user import UserResponse, UserCard
 
 class MatchUserResponse(BaseModel):
     matchId: int
@@ -13,7 +13,7 @@ class MatchUserResponse(BaseModel):
 class MatchResponse(BaseModel):
     id: int
     createdAt: datetime
-    user: UserResponse
+    user: UserCard
     
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -39,7 +39,8 @@ class ConversationSummary(BaseModel):
         from_attributes = True
 
 class ConversationDetail(ConversationSummary):
-    messages: List[MessageResponse]
+    messages: List[MessageResponse] # Newest page only, oldest first
+    messagesCursor: Optional[str] = None # Pass as `before` to /conversations/{id}/messages for older history
     
     class Config:
         from_attributes = True
\ No newline at end of file
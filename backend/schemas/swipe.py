@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class SwipeCreate(BaseModel):
@@ -14,4 +14,15 @@ class SwipeResponse(BaseModel):
     matchId: Optional[int] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SwipeBatch(BaseModel):
+    actions: List[SwipeCreate] = Field(min_length=1, max_length=100) # Applied in order; the first action per target wins
+
+class SwipeBatchResult(BaseModel):
+    targetId: int
+    isLike: bool
+    status: str # "liked", "passed", "duplicate" (already swiped) or "invalid" (unknown, unapproved or self)
+    id: Optional[int] = None # Swipe id of a newly recorded like
+    isMatch: bool = False
+    matchId: Optional[int] = None
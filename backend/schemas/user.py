@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field, validator
+from pydantic import BaseModel, EmailStr, Field, validator, field_validator
 from typing import Optional, List
 from datetime import datetime
+from utils.storage import storageUrl
 
 # Normalization helpers
 _ALLOWED_GENDERS = {"male": "Male", "m": "Male", "man": "Male", "men": "Male",
@@ -128,9 +129,18 @@ class UserPreferencesUpdate(BaseModel):
 class ImageResponse(BaseModel):
     id: int
     imageUrl: str # URL/path to the image file
+    smallUrl: Optional[str] = None # 200px WebP variant
+    mediumUrl: Optional[str] = None # 600px WebP variant
+    largeUrl: Optional[str] = None # 1200px WebP variant
     isPrimary: bool # Whether this is the user's main profile picture
     createdAt: datetime # When image was uploaded
     
+    # Same storage key -> URL mapping as schemas/images.py
+    @field_validator("imageUrl", "smallUrl", "mediumUrl", "largeUrl")
+    @classmethod
+    def toStorageUrl(cls, value):
+        return storageUrl(value)
+    
     class Config:
         from_attributes = True
 
@@ -165,6 +175,21 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Lean profile for the discovery feed and match list: only the fields those cards render
+class UserCard(BaseModel):
+    id: int
+    name: str
+    age: int
+    college: str
+    major: str
+    bio: str
+    interests: List[str]
+    classes: List[str]
+    images: List[ImageResponse] = []
+    
+    class Config:
+        from_attributes = True
+
 # Schema for email verification requests (login and registration)
 class EmailVerificationRequest(BaseModel):
     email: EmailStr
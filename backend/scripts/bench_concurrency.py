@@ -0,0 +1,95 @@
+# Concurrent-request load benchmark against a running API server.
+# Fires --requests GETs at each endpoint with --concurrency in flight and reports
+# throughput and latency percentiles, so a single uvicorn worker can be compared
+# before and after a change (e.g. the sync -> async database layer).
+#
+# Usage (from backend/, with the server running):
+#   uvicorn main:app --workers 1 &
+#   python -m scripts.bench_concurrency --user-id 42 --concurrency 50 --requests 1000
+#   python -m scripts.bench_concurrency --endpoint /interactions/matches --endpoint /messages/conversations
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import httpx
+from database import localSession
+from models.user import User
+import models.images
+import models.swipe
+import models.match
+import models.message
+import models.preference
+import models.candidate_pool
+from utils.jwt_auth import createAccessToken
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_ENDPOINTS = [
+    "/recommendations/discover",
+    "/recommendations/stats",
+    "/interactions/matches",
+    "/messages/conversations",
+]
+
+def tokenFor(userId: int) -> str:
+    db = localSession()
+    try:
+        email = db.query(User.email).filter(User.id == userId).scalar()
+    finally:
+        db.close()
+    if email is None:
+        raise SystemExit(f"No user with id {userId}")
+    return createAccessToken({"sub": email})
+
+async def run(client: httpx.AsyncClient, path: str, total: int, concurrency: int):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure concurrent-request throughput of the API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the running server")
+    parser.add_argument("--user-id", type=int, default=1, help="user to authenticate as")
+    parser.add_argument("--endpoint", action="append", help="GET path to hit (repeatable)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {tokenFor(args.user_id)}"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=60) as client:
+        print(f"{'endpoint':<32} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for path in args.endpoint or DEFAULT_ENDPOINTS:
+            # One warm-up request so connection setup and caches don't skew the run
+            await client.get(path)
+            latencies, errors, elapsed = await run(client, path, args.requests, args.concurrency)
+            print(f"{path:<32} {len(latencies) / elapsed:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>8.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.1f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,114 @@
+# Serialization benchmark for one discovery page, run straight against the database (no server).
+# Renders the same --page-size approved users through each response path and reports the time
+# per page (loading + serializing) and the payload size:
+#   full+json      select(User) rows -> List[UserResponse] -> json (FastAPI's previous default path)
+#   full+orjson    same rows and schema, rendered by ORJSONResponse (main.py's default_response_class)
+#   card+orjson    columns UserCard renders only -> List[UserCard] -> ORJSONResponse
+#   cached cards   ids/versions only, pre-rendered UserCard bytes joined into a list (utils/profile_cards.py)
+#
+# Usage (from backend/):
+#   python -m scripts.bench_serialization --page-size 20 --repeat 200
+import argparse
+import statistics
+import time
+from typing import List
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
+from database import localSession
+from models.user import User
+import models.images
+import models.swipe
+import models.match
+import models.message
+import models.preference
+import models.candidate_pool
+import models.user_stats
+from schemas.user import UserResponse, UserCard
+
+fullPage = TypeAdapter(List[UserResponse])
+cardPage = TypeAdapter(List[UserCard])
+cardColumns = [getattr(User, name) for name in UserCard.model_fields if name in User.__table__.columns]
+
+def pageIds(pageSize: int) -> List[int]:
+    db = localSession()
+    try:
+        return db.scalars(
+            select(User.id).where(User.moderationStatus == "Approved").order_by(User.id).limit(pageSize)
+        ).all()
+    finally:
+        db.close()
+
+def loadUsers(ids: List[int], columns=None):
+    # New session each time, so every run hydrates fresh objects like a request does
+    db = localSession()
+    try:
+        query = select(User).where(User.id.in_(ids))
+        if columns is not None:
+            query = query.options(load_only(*columns))
+        return db.scalars(query).all()
+    finally:
+        db.close()
+
+def fullJson(ids):
+    # As FastAPI serializes a response_model: validate, dump to JSON-able data, then render
+    content = fullPage.dump_python(fullPage.validate_python(loadUsers(ids), from_attributes=True), mode="json")
+    return JSONResponse(content).body
+
+def fullOrjson(ids):
+    content = fullPage.dump_python(fullPage.validate_python(loadUsers(ids), from_attributes=True), mode="json")
+    return ORJSONResponse(content).body
+
+def cardOrjson(ids):
+    content = cardPage.dump_python(cardPage.validate_python(loadUsers(ids, cardColumns), from_attributes=True), mode="json")
+    return ORJSONResponse(content).body
+
+def cachedCards(ids, cards):
+    db = localSession()
+    try:
+        refs = db.execute(select(User.id, User.profileVersion).where(User.id.in_(ids))).all()
+    finally:
+        db.close()
+    return b"[" + b",".join(cards[tuple(ref)] for ref in refs) + b"]"
+
+def measure(render, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = render()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response serialization paths for one discovery page")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    ids = pageIds(args.page_size)
+    if len(ids) < args.page_size:
+        raise SystemExit(f"Only {len(ids)} approved users; seed more to benchmark a {args.page_size}-user page")
+
+    # What the card cache would hold after the first request
+    cards = {(user.id, user.profileVersion): UserCard.model_validate(user).model_dump_json().encode()
+             for user in loadUsers(ids, cardColumns + [User.profileVersion])}
+
+    paths = [
+        ("full+json", lambda: fullJson(ids)),
+        ("full+orjson", lambda: fullOrjson(ids)),
+        ("card+orjson", lambda: cardOrjson(ids)),
+        ("cached cards", lambda: cachedCards(ids, cards)),
+    ]
+    for _, render in paths:
+        render()  # Warm up connections and schema caches
+
+    print(f"{args.page_size}-user discovery page, {args.repeat} runs each")
+    print(f"{'path':<14} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>8}")
+    for name, render in paths:
+        times, size = measure(render, args.repeat)
+        p95 = statistics.quantiles(times, n=20)[-1]
+        print(f"{name:<14} {statistics.median(times):>8.2f} {p95:>8.2f} {size:>8}")
+
+if __name__ == "__main__":
+    main()
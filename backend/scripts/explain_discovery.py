@@ -0,0 +1,167 @@
+# Index advisor for the discovery queries in routes/recommendations.py.
+# Runs EXPLAIN (ANALYZE, BUFFERS) on each query for one viewer and flags sequential scans.
+#
+# Usage (from backend/):
+#   python -m scripts.explain_discovery --seed-users 5000      # seed fake approved users first
+#   python -m scripts.explain_discovery --user-id 42 --fail-on-seq-scan
+#   python -m scripts.explain_discovery --cleanup               # remove seeded users
+import argparse
+import json
+import random
+import sys
+from sqlalchemy import select, func, or_, text
+from database import localSession
+from models.user import User
+import models.swipe
+import models.match
+import models.images
+import models.message
+import models.preference
+from models.candidate_pool import CandidatePool
+from routes.recommendations import rankedPageQuery, poolOrder, fallbackOrder, discoveryStatsQuery
+from utils.candidate_pool import Viewer, Candidate, compatibilityFilters, poolQuery, ensureViewerPool
+
+SEED_EMAIL_DOMAIN = "@seed.ucla.edu"
+COLLEGES = ["UCLA", "Berkeley", "UCSD", "UCSB", "UCI", "UCR", "UCSC", "UC Davis", "UC Merced"]
+MAJORS = ["Computer Science", "Biology", "Economics", "Psychology", "Mathematics",
+          "Political Science", "Mechanical Engineering", "English", "Chemistry", "Art"]
+INTERESTS = ["hiking", "music", "gaming", "cooking", "reading", "surfing", "film", "travel"]
+
+def seedUsers(db, count: int):
+    rng = random.Random(0)
+    start = db.query(func.count(User.id)).filter(User.email.like(f"%{SEED_EMAIL_DOMAIN}")).scalar()
+    for n in range(start, start + count):
+        college = rng.choice(COLLEGES)
+        minAge = rng.randint(18, 24)
+        db.add(User(
+            email=f"seed{n}{SEED_EMAIL_DOMAIN}",
+            name=f"Seed User {n}",
+            college=college,
+            school="Letters & Science",
+            year=rng.randint(2025, 2029),
+            age=rng.randint(18, 30),
+            gender=rng.choice(["Male", "Female"]),
+            major=rng.choice(MAJORS),
+            moderationStatus="Approved",
+            bio="Seeded profile for query planning.",
+            interests=rng.sample(INTERESTS, 3),
+            classes=[],
+            lookingFor="Dating",
+            smokes=rng.random() < 0.1,
+            drinks=rng.random() < 0.5,
+            pronouns="They/Them",
+            location=college,
+            hometown="Los Angeles, CA",
+            minAge=minAge,
+            maxAge=minAge + rng.randint(2, 10),
+            genderPref=rng.choice(["Male", "Female", "Everyone"]),
+            otherColleges=rng.sample(COLLEGES, rng.randint(0, 2)),
+            majors=rng.sample(MAJORS, rng.randint(0, 3)),
+        ))
+    db.commit()
+    # Fresh planner statistics, otherwise the estimates below describe an empty table
+    db.execute(text("ANALYZE users"))
+    db.commit()
+    print(f"Seeded {count} users")
+
+def cleanupUsers(db):
+    seeded = select(User.id).where(User.email.like(f"%{SEED_EMAIL_DOMAIN}")).scalar_subquery()
+    db.query(CandidatePool).filter(
+        or_(CandidatePool.viewerId.in_(seeded), CandidatePool.candidateId.in_(seeded))
+    ).delete(synchronize_session=False)
+    deleted = db.query(User).filter(User.email.like(f"%{SEED_EMAIL_DOMAIN}")).delete(synchronize_session=False)
+    db.commit()
+    print(f"Removed {deleted} seeded users")
+
+def discoveryQueries(viewerId: int):
+    return {
+        "pool build (viewer)": select(Viewer.id, Candidate.id).where(
+            Viewer.id == viewerId, *compatibilityFilters()
+        ),
+        "pool refresh (candidate)": select(Viewer.id, Candidate.id).where(
+            Candidate.id == viewerId, *compatibilityFilters()
+        ),
+        "discover page": rankedPageQuery(
+            poolQuery(viewerId), poolOrder(), limit=20
+        ),
+        "discover next page": rankedPageQuery(
+            poolQuery(viewerId), poolOrder(), limit=20, after=(-1.0, 0, 0)
+        ),
+        "discover fallback page": rankedPageQuery(
+            select(User).where(User.id != viewerId, User.moderationStatus == "Approved"),
+            fallbackOrder(viewerId, seed=1), limit=20
+        ),
+        # The single statement GET /recommendations/stats runs
+        "stats": discoveryStatsQuery(viewerId),
+    }
+
+def walkPlan(node, depth=0):
+    yield node, depth
+    for child in node.get("Plans", []):
+        yield from walkPlan(child, depth + 1)
+
+def explain(db, statement):
+    compiled = statement.compile(dialect=db.bind.dialect)
+    sql = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(compiled)
+    raw = db.connection().exec_driver_sql(sql, compiled.params).scalar()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]
+
+def report(db, viewerId: int) -> int:
+    seqScans = 0
+    for name, statement in discoveryQueries(viewerId).items():
+        result = explain(db, statement)
+        plan = result["Plan"]
+        print(f"\n== {name}: {result['Execution Time']:.2f} ms, "
+              f"shared hit={plan.get('Shared Hit Blocks', 0)} read={plan.get('Shared Read Blocks', 0)}")
+        for node, depth in walkPlan(plan):
+            label = node["Node Type"]
+            if node.get("Relation Name"):
+                label += f" on {node['Relation Name']}"
+            if node.get("Index Name"):
+                label += f" using {node['Index Name']}"
+            flag = ""
+            if node["Node Type"] == "Seq Scan":
+                seqScans += 1
+                flag = "  <-- SEQ SCAN"
+            print(f"{'  ' * depth}- {label} (rows={node.get('Actual Rows')}, "
+                  f"loops={node.get('Actual Loops')}){flag}")
+        # EXPLAIN ANALYZE executes the statement; never keep its effects
+        db.rollback()
+
+    print(f"\n{seqScans} sequential scan(s) found")
+    return seqScans
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the discovery queries and flag sequential scans")
+    parser.add_argument("--user-id", type=int, help="viewer to plan for (defaults to a seeded user)")
+    parser.add_argument("--seed-users", type=int, default=0, help="insert this many fake approved users first")
+    parser.add_argument("--cleanup", action="store_true", help="delete seeded users and exit")
+    parser.add_argument("--fail-on-seq-scan", action="store_true", help="exit 1 if any sequential scan is found")
+    args = parser.parse_args()
+
+    db = localSession()
+    try:
+        if args.cleanup:
+            cleanupUsers(db)
+            return 0
+        if args.seed_users:
+            seedUsers(db, args.seed_users)
+
+        viewerId = args.user_id or db.query(User.id).filter(
+            User.email.like(f"%{SEED_EMAIL_DOMAIN}")
+        ).order_by(User.id).limit(1).scalar()
+        if viewerId is None:
+            print("No viewer: pass --user-id or --seed-users", file=sys.stderr)
+            return 2
+        # Discovery builds the pool on first visit; plan against a built one, as steady-state requests see it
+        ensureViewerPool(db, viewerId)
+        db.execute(text("ANALYZE candidate_pools"))
+        db.commit()
+
+        seqScans = report(db, viewerId)
+        return 1 if seqScans and args.fail_on_seq_scan else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
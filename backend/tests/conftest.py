@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+import asyncio
+import pytest
+import redis
+import fakeredis
+
+# The app reads its configuration at import time, so set it up before anything imports main.
+# Tests run against the PostgreSQL database in DATABASE_URL (use a disposable one); the users
+# they create are removed again afterwards.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)  # The storage root is relative to the backend
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SWIPE_GRAPH_SNAPSHOT", "")
+os.makedirs("uploads", exist_ok=True)
+STORAGE_ROOT = tempfile.mkdtemp(prefix="test-", dir="uploads")
+os.environ["LOCAL_STORAGE_ROOT"] = STORAGE_ROOT
+
+if not os.getenv("DATABASE_URL"):
+    pytest.exit("Set DATABASE_URL to a PostgreSQL test database to run the tests", returncode=1)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from database import localSession
+from models.user import User
+from utils import realtime
+from utils.jwt_auth import createAccessToken
+
+@pytest.fixture
+def anyio_backend():
+    # The app runs on asyncio
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def redisServer():
+    # In-process stand-in for the Redis every worker shares
+    return fakeredis.FakeServer()
+
+def waitForSubscribers(client, channel: str, count: int, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if dict(client.pubsub_numsub(channel)).get(channel, 0) >= count:
+            return
+        time.sleep(0.01)
+    raise TimeoutError(f"Fewer than {count} subscribers on {channel}")
+
+class FlakyRedis:
+    # A Redis client whose subscriptions fail while `down` is set, like a dropped connection
+
+    def __init__(self, client):
+        self.client = client
+        self.down = False
+        self.subscriptions = 0
+
+    def pubsub(self, **kwargs):
+        return FlakyPubSub(self, self.client.pubsub(**kwargs))
+
+class FlakyPubSub:
+
+    def __init__(self, owner: FlakyRedis, pubsub):
+        self.owner = owner
+        self.pubsub = pubsub
+
+    def _check(self):
+        if self.owner.down:
+            raise redis.ConnectionError("Connection closed by server.")
+
+    def subscribe(self, *channels):
+        self._check()
+        self.pubsub.subscribe(*channels)
+        self.owner.subscriptions += 1
+
+    def get_message(self, **kwargs):
+        self._check()
+        return self.pubsub.get_message(**kwargs)
+
+    def close(self):
+        self.pubsub.close()
+
+async def until(condition, timeout: float = 5.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+@pytest.fixture(scope="session")
+def client(redisServer):
+    import main
+    # Realtime fan-out goes through the fake Redis, like it would between workers
+    previous = realtime._redis
+    realtime._redis = fakeredis.FakeRedis(server=redisServer, decode_responses=True)
+    try:
+        with TestClient(main.app) as testClient:
+            waitForSubscribers(realtime._redis, realtime.EVENTS_CHANNEL, 1)
+            yield testClient
+    finally:
+        realtime._redis = previous
+        shutil.rmtree(STORAGE_ROOT, ignore_errors=True)
+
+@pytest.fixture
+def makeUser():
+    # Approved users with unique emails; everything that references them is deleted afterwards
+    created = []
+
+    def make(**fields):
+        values = dict(
+            email=f"test-{uuid.uuid4().hex[:12]}@test.ucla.edu", name="Test User", college="UCLA",
+            school="Engineering", year=2026, age=21, gender="Female", major="Computer Science",
+            moderationStatus="Approved", bio="Here for the tests.", interests=["Testing"], classes=[],
+            lookingFor="Friends", pronouns="She/Her", location="Los Angeles, CA", hometown="Davis, CA",
+            minAge=18, maxAge=30, genderPref="Everyone", otherColleges=[], majors=[],
+        )
+        values.update(fields)
+        db = localSession()
+        try:
+            user = User(**values)
+            db.add(user)
+            db.commit()
+            created.append(user.id)
+            return user
+        finally:
+            db.close()
+
+    yield make
+
+    if created:
+        db = localSession()
+        try:
+            ids = {"ids": created}
+            db.execute(text('DELETE FROM conversations WHERE "userId1" = ANY(:ids) OR "userId2" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM messages WHERE "senderId" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM matches WHERE "userId1" = ANY(:ids) OR "userId2" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM swipes WHERE "userId" = ANY(:ids) OR "targetId" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM images WHERE "userId" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM preference_strengths WHERE "userId" = ANY(:ids)'), ids)
+            db.execute(text('DELETE FROM users WHERE id = ANY(:ids)'), ids)
+            db.commit()
+        finally:
+            db.close()
+
+def tokenFor(user) -> str:
+    return createAccessToken({"sub": user.email})
+
+def authHeaders(user) -> dict:
+    return {"Authorization": f"Bearer {tokenFor(user)}"}
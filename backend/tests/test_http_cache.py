@@ -0,0 +1,30 @@
+from conftest import authHeaders
+
+def viewProfile(client, viewer, user, **headers):
+    return client.get(f"/profile/viewProfile/{user.id}", headers={**authHeaders(viewer), **headers})
+
+def test_revalidation_repeats_the_validators_of_the_compressed_response(client, makeUser):
+    # Long enough that the compression middleware encodes it
+    viewer, user = makeUser(), makeUser(bio="Long bio. " * 200)
+    compressed = viewProfile(client, viewer, user, **{"Accept-Encoding": "gzip"})
+    assert compressed.status_code == 200
+    assert compressed.headers["content-encoding"] == "gzip"
+    etag = compressed.headers["etag"]
+    assert etag.startswith('W/"')
+    assert compressed.headers["vary"] == "Accept-Encoding"
+
+    revalidated = viewProfile(client, viewer, user, **{"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.headers["vary"] == "Accept-Encoding"
+
+def test_identity_and_compressed_responses_share_one_tag(client, makeUser):
+    viewer, user = makeUser(), makeUser(bio="Long bio. " * 200)
+    plain = viewProfile(client, viewer, user, **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    compressed = viewProfile(client, viewer, user, **{"Accept-Encoding": "br"})
+    assert compressed.headers["etag"] == plain.headers["etag"]
+    # Either form of the tag revalidates; a different one doesn't
+    assert viewProfile(client, viewer, user, **{"If-None-Match": plain.headers["etag"].removeprefix("W/")}).status_code == 304
+    assert viewProfile(client, viewer, user, **{"If-None-Match": 'W/"other"'}).status_code == 200
@@ -0,0 +1,98 @@
+import io
+import os
+from PIL import Image as PILImage
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import localSession
+from models.images import Image
+from utils.storage import storage
+from conftest import authHeaders
+
+def pngBytes(color) -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 64), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def upload(client, user, data: bytes):
+    response = client.post("/images/upload", files={"file": ("photo.png", data, "image/png")}, headers=authHeaders(user))
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def storedRow(imageId: int) -> Image:
+    db = localSession()
+    try:
+        return db.scalars(select(Image).where(Image.id == imageId)).one()
+    finally:
+        db.close()
+
+def variantKeys(image: Image):
+    return {image.imageUrl, image.smallUrl, image.mediumUrl, image.largeUrl} - {None}
+
+def stored(key: str) -> bool:
+    return os.path.exists(storage._path(key))
+
+def test_same_upload_shares_files_until_last_reference_is_deleted(client, makeUser):
+    first, second = makeUser(), makeUser()
+    data = pngBytes((200, 40, 40))
+    firstImage = storedRow(upload(client, first, data))
+    secondImage = storedRow(upload(client, second, data))
+
+    # Second upload of the same bytes points at the first one's variants
+    assert firstImage.contentHash == secondImage.contentHash
+    assert variantKeys(firstImage) == variantKeys(secondImage)
+    assert {firstImage.smallUrl, firstImage.mediumUrl, firstImage.largeUrl} <= variantKeys(firstImage)
+    assert all(stored(key) for key in variantKeys(firstImage))
+
+    # Still referenced by the second user's image
+    assert client.delete(f"/images/{firstImage.id}", headers=authHeaders(first)).status_code == 200
+    assert all(stored(key) for key in variantKeys(firstImage))
+    assert client.get("/images/my-images", headers=authHeaders(second)).json()[0]["id"] == secondImage.id
+
+    # Last reference gone: so are the files
+    assert client.delete(f"/images/{secondImage.id}", headers=authHeaders(second)).status_code == 200
+    assert not any(stored(key) for key in variantKeys(firstImage))
+
+def test_different_uploads_keep_their_own_files(client, makeUser):
+    user = makeUser()
+    redImage = storedRow(upload(client, user, pngBytes((200, 40, 40))))
+    blueImage = storedRow(upload(client, user, pngBytes((40, 40, 200))))
+    assert redImage.contentHash != blueImage.contentHash
+    assert not variantKeys(redImage) & variantKeys(blueImage)
+
+    assert client.delete(f"/images/{redImage.id}", headers=authHeaders(user)).status_code == 200
+    assert not any(stored(key) for key in variantKeys(redImage))
+    assert all(stored(key) for key in variantKeys(blueImage))
+
+def test_rows_without_a_hash_own_their_file(client, makeUser):
+    # Uploads from before deduplication have only the original file and no content hash
+    user = makeUser()
+    key = "images/legacy-test-upload.jpg"
+    os.makedirs(os.path.dirname(storage._path(key)), exist_ok=True)
+    with open(storage._path(key), "wb") as out:
+        out.write(b"not really a jpeg")
+    db = localSession()
+    try:
+        legacy = Image(userId=user.id, imageUrl=key)
+        db.add(legacy)
+        db.commit()
+        legacyId = legacy.id
+    finally:
+        db.close()
+
+    assert client.delete(f"/images/{legacyId}", headers=authHeaders(user)).status_code == 200
+    assert not stored(key)
+
+def test_failed_delete_keeps_row_and_files(client, makeUser, monkeypatch):
+    user = makeUser()
+    image = storedRow(upload(client, user, pngBytes((40, 200, 40))))
+
+    async def failingCommit(self):
+        raise OperationalError("COMMIT", {}, Exception("connection lost"))
+    monkeypatch.setattr(AsyncSession, "commit", failingCommit)
+    assert client.delete(f"/images/{image.id}", headers=authHeaders(user)).status_code == 500
+    monkeypatch.undo()
+
+    # The row still points at its files, so they must still be there
+    assert storedRow(image.id).id == image.id
+    assert all(stored(key) for key in variantKeys(image))
@@ -0,0 +1,42 @@
+import asyncio
+import httpx
+from sqlalchemy import select
+from database import localSession
+from models.match import Match
+from conftest import authHeaders
+
+PAIRS = 10
+
+def pairMatches(first, second):
+    db = localSession()
+    try:
+        return db.scalars(select(Match).where(
+            Match.userId1 == min(first.id, second.id),
+            Match.userId2 == max(first.id, second.id)
+        )).all()
+    finally:
+        db.close()
+
+def test_simultaneous_mutual_likes_match_once(client, makeUser):
+    pairs = [(makeUser(), makeUser()) for _ in range(PAIRS)]
+
+    async def likeEachOther():
+        # On the app's own event loop, so both likes of a pair really are in flight together
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post(f"/interactions/like?targetId={target.id}", headers=authHeaders(liker))
+                for first, second in pairs
+                for liker, target in ((first, second), (second, first))
+            ))
+
+    responses = client.portal.call(likeEachOther)
+    assert all(response.status_code == 200 for response in responses), [response.text for response in responses]
+
+    for index, (first, second) in enumerate(pairs):
+        matches = pairMatches(first, second)
+        assert len(matches) == 1
+        # The like that completed the pair reports the match; the other one came first and didn't
+        results = [responses[2 * index].json(), responses[2 * index + 1].json()]
+        assert sorted(result["isMatch"] for result in results) == [False, True]
+        assert [result["matchId"] for result in results if result["isMatch"]] == [matches[0].id]
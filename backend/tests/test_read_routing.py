@@ -0,0 +1,78 @@
+import os
+import pytest
+import fakeredis
+import database
+from database import asyncEngine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from utils import read_routing
+from utils.user_cache import TTLCache
+from conftest import authHeaders
+
+class BrokenRedis:
+    def setex(self, *args):
+        raise ConnectionError("Redis is down")
+
+    def exists(self, *args):
+        raise ConnectionError("Redis is down")
+
+@pytest.fixture
+def replica(monkeypatch):
+    # Pretend a replica is configured and record which session each read-only handler gets.
+    # Both factories open sessions on the test database, so the handlers still work.
+    used = []
+
+    def recorded(name):
+        factory = async_sessionmaker(bind=asyncEngine, autoflush=False, expire_on_commit=False)
+        def openSession():
+            used.append(name)
+            return factory()
+        return openSession
+
+    monkeypatch.setattr(read_routing, "USE_REPLICA", True)
+    monkeypatch.setattr(read_routing, "_recentWrites", TTLCache(100, read_routing.READ_YOUR_WRITES_SECONDS))
+    monkeypatch.setattr(read_routing, "redis_client", fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(read_routing, "readSession", recorded("replica"))
+    monkeypatch.setattr(read_routing, "asyncSession", recorded("primary"))
+    return used
+
+@pytest.mark.skipif(bool(os.getenv("DATABASE_REPLICA_URL")), reason="a replica is configured")
+def test_reads_use_primary_without_replica():
+    # No DATABASE_REPLICA_URL: the read engine is the primary and nothing is tracked
+    assert database.readEngine is database.asyncEngine
+    assert read_routing.USE_REPLICA is False
+    read_routing.markRecentWrite("someone@test.ucla.edu")
+    assert not read_routing.wroteRecently("someone@test.ucla.edu")
+
+def test_reads_go_to_replica_until_user_writes(client, makeUser, replica):
+    user, other = makeUser(), makeUser()
+    assert client.get("/messages/conversations", headers=authHeaders(user)).status_code == 200
+    assert replica == ["replica"]
+
+    assert client.put("/profile/update", json={"bio": "Updated for the routing test."}, headers=authHeaders(user)).status_code == 200
+    assert client.get("/messages/conversations", headers=authHeaders(user)).status_code == 200
+    assert replica[-1] == "primary"
+
+    # Only the writer is pinned to the primary
+    assert client.get("/messages/conversations", headers=authHeaders(other)).status_code == 200
+    assert replica[-1] == "replica"
+
+def test_failed_writes_do_not_pin_reads(client, makeUser, replica):
+    user = makeUser()
+    assert client.put("/profile/update", json={"name": ""}, headers=authHeaders(user)).status_code == 422
+    assert client.get("/messages/conversations", headers=authHeaders(user)).status_code == 200
+    assert replica == ["replica"]
+
+def test_recent_write_seen_by_other_workers(replica, monkeypatch):
+    read_routing.markRecentWrite("writer@test.ucla.edu")
+    # Another worker has nothing locally and finds the mark in Redis
+    monkeypatch.setattr(read_routing, "_recentWrites", TTLCache(100, read_routing.READ_YOUR_WRITES_SECONDS))
+    assert read_routing.wroteRecently("writer@test.ucla.edu")
+    assert not read_routing.wroteRecently("reader@test.ucla.edu")
+
+def test_unreachable_redis_falls_back_to_primary(replica, monkeypatch):
+    monkeypatch.setattr(read_routing, "redis_client", BrokenRedis())
+    # Unknown state stays consistent: read from the primary
+    assert read_routing.wroteRecently("anyone@test.ucla.edu")
+    # The write is still remembered on this worker
+    read_routing.markRecentWrite("writer@test.ucla.edu")
+    assert read_routing._recentWrites.get("writer@test.ucla.edu")
@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+import fakeredis
+from starlette.websockets import WebSocketDisconnect
+from database import localSession
+from models.match import Match
+from utils import realtime
+from utils.jwt_auth import createAccessToken
+from conftest import authHeaders, tokenFor, waitForSubscribers, FlakyRedis, until
+
+class FakeSocket:
+    # Stands in for a WebSocket held by a ConnectionManager
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+
+    async def send_json(self, event):
+        await self.events.put(event)
+
+def connect(client, user):
+    websocket = client.websocket_connect(f"/messages/ws?token={tokenFor(user)}")
+    websocket.__enter__()
+    # The server registers the socket before it answers its first ping
+    websocket.send_text("ping")
+    assert websocket.receive_text() == "pong"
+    return websocket
+
+def matchUsers(first, second):
+    db = localSession()
+    try:
+        db.add(Match(userId1=min(first.id, second.id), userId2=max(first.id, second.id)))
+        db.commit()
+    finally:
+        db.close()
+
+def test_websocket_rejects_invalid_token(client):
+    with pytest.raises(WebSocketDisconnect) as rejected:
+        with client.websocket_connect("/messages/ws?token=not-a-jwt"):
+            pass
+    assert rejected.value.code == 1008
+
+def test_websocket_rejects_unknown_user(client):
+    token = createAccessToken({"sub": "nobody-here@test.ucla.edu"})
+    with pytest.raises(WebSocketDisconnect) as rejected:
+        with client.websocket_connect(f"/messages/ws?token={token}"):
+            pass
+    assert rejected.value.code == 1008
+
+def test_message_and_read_receipt_events(client, makeUser):
+    sender, recipient = makeUser(), makeUser()
+    matchUsers(sender, recipient)
+    conversation = client.post("/messages/conversations", json={"userId2": recipient.id}, headers=authHeaders(sender))
+    assert conversation.status_code == 200
+    conversationId = conversation.json()["id"]
+
+    senderSocket, recipientSocket = connect(client, sender), connect(client, recipient)
+    try:
+        sent = client.post(f"/messages/conversations/{conversationId}/messages", json={"content": "Hi there"}, headers=authHeaders(sender))
+        assert sent.status_code == 200
+        # Both participants get the message, including the sender's other tabs
+        for websocket in (recipientSocket, senderSocket):
+            event = websocket.receive_json()
+            assert event["type"] == "message"
+            assert event["message"]["id"] == sent.json()["id"]
+            assert event["message"]["content"] == "Hi there"
+
+        read = client.put(f"/messages/conversations/{conversationId}/read", headers=authHeaders(recipient))
+        assert read.status_code == 200
+        assert senderSocket.receive_json() == {"type": "read", "conversationId": conversationId, "readerId": recipient.id}
+    finally:
+        senderSocket.__exit__(None, None, None)
+        recipientSocket.__exit__(None, None, None)
+
+def test_match_event_reaches_both_users(client, makeUser):
+    first, second = makeUser(), makeUser()
+    firstSocket, secondSocket = connect(client, first), connect(client, second)
+    try:
+        assert client.post(f"/interactions/like?targetId={second.id}", headers=authHeaders(first)).status_code == 200
+        assert client.post(f"/interactions/like?targetId={first.id}", headers=authHeaders(second)).status_code == 200
+        for websocket in (firstSocket, secondSocket):
+            event = websocket.receive_json()
+            assert event["type"] == "match"
+            assert sorted(event["userIds"]) == sorted([first.id, second.id])
+    finally:
+        firstSocket.__exit__(None, None, None)
+        secondSocket.__exit__(None, None, None)
+
+@pytest.mark.anyio
+async def test_events_reach_sockets_on_other_workers(monkeypatch):
+    # Two workers, each with its own connections and Redis client, sharing one Redis
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(realtime, "_redis", fakeredis.FakeRedis(server=server, decode_responses=True))
+    workers = [realtime.ConnectionManager(), realtime.ConnectionManager()]
+    sockets = [FakeSocket(), FakeSocket()]
+    workers[0].connect(1, sockets[0])
+    workers[1].connect(2, sockets[1])
+    listeners = [
+        asyncio.create_task(realtime._listen(fakeredis.FakeRedis(server=server, decode_responses=True), worker))
+        for worker in workers
+    ]
+    try:
+        await asyncio.to_thread(waitForSubscribers, realtime._redis, realtime.EVENTS_CHANNEL, 2)
+
+        realtime.publishEvent([2], {"type": "match", "matchId": 7, "userIds": [2, 3]})
+        assert await asyncio.wait_for(sockets[1].events.get(), 5) == {"type": "match", "matchId": 7, "userIds": [2, 3]}
+
+        realtime.publishEvent([1, 2], {"type": "read", "conversationId": 4, "readerId": 3})
+        for socket in sockets:
+            assert await asyncio.wait_for(socket.events.get(), 5) == {"type": "read", "conversationId": 4, "readerId": 3}
+        # The first event was for user 2 only
+        assert sockets[0].events.empty()
+    finally:
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+@pytest.mark.anyio
+async def test_listener_resubscribes_after_redis_drops(monkeypatch, caplog):
+    monkeypatch.setattr(realtime, "RECONNECT_MIN_SECONDS", 0.01)
+    monkeypatch.setattr(realtime, "RECONNECT_MAX_SECONDS", 0.05)
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(realtime, "_redis", fakeredis.FakeRedis(server=server, decode_responses=True))
+    flaky = FlakyRedis(fakeredis.FakeRedis(server=server, decode_responses=True))
+    worker, socket = realtime.ConnectionManager(), FakeSocket()
+    worker.connect(1, socket)
+    listener = asyncio.create_task(realtime._listen(flaky, worker))
+    try:
+        await asyncio.to_thread(waitForSubscribers, realtime._redis, realtime.EVENTS_CHANNEL, 1)
+        flaky.down = True
+        # Resubscribing keeps failing while Redis is down; the listener logs and keeps trying
+        await until(lambda: "Realtime subscription lost" in caplog.text)
+        await asyncio.sleep(0.1)
+        assert not listener.done()
+
+        flaky.down = False
+        await until(lambda: flaky.subscriptions >= 2)
+        realtime.publishEvent([1], {"type": "read", "conversationId": 4, "readerId": 3})
+        assert await asyncio.wait_for(socket.events.get(), 5) == {"type": "read", "conversationId": 4, "readerId": 3}
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+@pytest.mark.anyio
+async def test_events_stay_local_without_redis(monkeypatch):
+    monkeypatch.setattr(realtime, "_redis", None)
+    socket = FakeSocket()
+    realtime.manager.connect(1, socket)
+    try:
+        realtime.publishEvent([1], {"type": "message", "message": {"id": 1}})
+        assert await asyncio.wait_for(socket.events.get(), 5) == {"type": "message", "message": {"id": 1}}
+    finally:
+        realtime.manager.disconnect(1, socket)
@@ -0,0 +1,86 @@
+import time
+import pytest
+import boto3
+from urllib.parse import urlparse, parse_qs
+from botocore.exceptions import ClientError
+from moto import mock_aws
+from utils.storage import LocalStorage, S3Storage, IMMUTABLE_CACHE_CONTROL
+
+BUCKET = "ucme-test-images"
+
+@pytest.fixture
+def s3(monkeypatch):
+    # moto's in-process S3; no requests leave the machine
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+def variantFile(tmp_path, name="photo_600.webp"):
+    path = tmp_path / name
+    path.write_bytes(b"RIFF\x00\x00\x00\x00WEBPVP8 fake image bytes")
+    return path
+
+@pytest.mark.anyio
+async def test_put_uploads_with_type_and_cache_headers(s3, tmp_path):
+    storage = S3Storage(BUCKET, None, "us-east-1")
+    path = variantFile(tmp_path)
+    await storage.put(str(path), "images/photo_600.webp", "image/webp")
+
+    stored = s3.get_object(Bucket=BUCKET, Key="images/photo_600.webp")
+    assert stored["Body"].read() == b"RIFF\x00\x00\x00\x00WEBPVP8 fake image bytes"
+    assert stored["ContentType"] == "image/webp"
+    assert stored["CacheControl"] == IMMUTABLE_CACHE_CONTROL
+    # The work file is handed over, not kept
+    assert not path.exists()
+
+@pytest.mark.anyio
+async def test_delete_removes_the_object(s3, tmp_path):
+    storage = S3Storage(BUCKET, None, "us-east-1")
+    await storage.put(str(variantFile(tmp_path)), "images/photo_600.webp", "image/webp")
+    await storage.delete("images/photo_600.webp")
+    with pytest.raises(ClientError):
+        s3.head_object(Bucket=BUCKET, Key="images/photo_600.webp")
+    # Deleting what's already gone is not an error (shared files may race to cleanup)
+    await storage.delete("images/photo_600.webp")
+
+def test_url_is_presigned_without_public_host(s3):
+    storage = S3Storage(BUCKET, None, "us-east-1", presignSeconds=600)
+    url = urlparse(storage.url("images/photo_600.webp"))
+    assert url.path.endswith("/images/photo_600.webp")
+    assert BUCKET in url.netloc + url.path
+    query = parse_qs(url.query)
+    # SigV4 carries the lifetime, SigV2 the expiry time
+    if "X-Amz-Expires" in query:
+        assert query["X-Amz-Expires"] == ["600"]
+        assert "X-Amz-Signature" in query
+    else:
+        assert abs(int(query["Expires"][0]) - (time.time() + 600)) < 60
+        assert "Signature" in query
+
+def test_url_uses_public_host_when_set(s3):
+    storage = S3Storage(BUCKET, None, "us-east-1", publicUrl="https://cdn.example.com")
+    assert storage.url("images/photo_600.webp") == "https://cdn.example.com/images/photo_600.webp"
+
+def test_custom_endpoint_for_s3_compatible_stores(s3):
+    # MinIO and friends: the client talks to S3_ENDPOINT_URL, and presigned URLs point there
+    storage = S3Storage(BUCKET, "http://minio.local:9000", "us-east-1")
+    assert storage.client.meta.endpoint_url == "http://minio.local:9000"
+    assert storage.url("images/photo_600.webp").startswith("http://minio.local:9000/")
+
+def test_uploads_are_staged_outside_the_served_root():
+    # Raw originals still carry EXIF/GPS; they must never be reachable under /uploads
+    from routes.images import WORK_DIR
+    from utils.storage import storage
+    assert not storage.servesPath(WORK_DIR)
+
+def test_served_root_detection(tmp_path):
+    served = LocalStorage(str(tmp_path / "uploads"))
+    assert served.servesPath(str(tmp_path / "uploads" / "tmp"))
+    assert not served.servesPath(str(tmp_path / "work"))
+    assert not served.servesPath(str(tmp_path / "uploads-work"))
+    # Behind a public URL nothing is served from the root by the app
+    assert not LocalStorage(str(tmp_path / "uploads"), "https://cdn.example.com").servesPath(str(tmp_path / "uploads" / "tmp"))
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+import fakeredis
+from database import localSession
+from models.swipe import Swipe
+from utils import realtime, swipe_graph
+from conftest import authHeaders, FlakyRedis, until
+
+def likeInDatabase(liker, target):
+    # A like committed by another worker, announced on a channel this worker isn't hearing
+    db = localSession()
+    try:
+        db.add(Swipe(userId=liker.id, targetId=target.id, isLike=True))
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.mark.anyio
+async def test_lost_updates_fall_back_to_sql_until_reloaded(client, makeUser, monkeypatch):
+    monkeypatch.setattr(realtime, "RECONNECT_MIN_SECONDS", 0.01)
+    monkeypatch.setattr(realtime, "RECONNECT_MAX_SECONDS", 0.05)
+    liker, target = makeUser(), makeUser()
+    assert swipe_graph.swipeGraph.loaded
+
+    flaky = FlakyRedis(fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True))
+    listener = asyncio.create_task(realtime._listen(flaky, realtime.ConnectionManager()))
+    try:
+        await until(lambda: flaky.subscriptions >= 1)
+        flaky.down = True
+        await until(lambda: not swipe_graph.swipeGraph.loaded)
+        assert swipe_graph.hasLiked(liker.id, target.id) is None
+
+        likeInDatabase(liker, target)
+        # Answered from SQL, so the missed like is there
+        sent = await asyncio.to_thread(client.get, "/interactions/sentLikes", headers=authHeaders(liker))
+        assert target.id in sent.json()
+        received = await asyncio.to_thread(client.get, "/interactions/receivedLikes", headers=authHeaders(target))
+        assert liker.id in received.json()
+
+        # Back on the channel: reloaded from the database, missed like included
+        flaky.down = False
+        await until(lambda: swipe_graph.swipeGraph.loaded)
+        assert swipe_graph.hasLiked(liker.id, target.id) is True
+        assert liker.id in swipe_graph.likedByIds(target.id)
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        await until(lambda: not realtime._hookTasks)
@@ -0,0 +1,187 @@
+import logging
+from sqlalchemy import and_, or_, not_, exists, func, select, insert, update, delete
+from sqlalchemy.dialects.postgresql import array, insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.exc import IntegrityError
+from models.user import User
+from models.swipe import Swipe
+from models.candidate_pool import CandidatePool, CandidatePoolState
+from utils.ranking import FEATURES, loadStrengths, scorePairs, weightsFor
+
+logger = logging.getLogger(__name__)
+
+SCORE_BATCH_SIZE = 1000
+
+# User columns compatibilityFilters reads: a change can move the user into or out of pools.
+# Ranking (utils/ranking.py FEATURES) only reorders them
+FILTER_FIELDS = {"gender", "genderPref", "age", "minAge", "maxAge", "college", "otherColleges", "majors", "moderationStatus"}
+
+# The discovery filter tree, written over two aliases of users so the same
+# predicate can build a viewer's whole pool or place one candidate into everyone's pool
+Viewer = aliased(User, name="viewer")
+Candidate = aliased(User, name="candidate")
+
+def compatibilityFilters(viewer=Viewer, candidate=Candidate):
+    # What the viewer is looking for
+    preferenceFilters = [
+        or_(
+            viewer.genderPref.is_(None),
+            viewer.genderPref == "Everyone",
+            candidate.gender == viewer.genderPref
+        ),
+        and_(
+            candidate.age >= viewer.minAge,
+            candidate.age <= viewer.maxAge
+        ),
+        or_(
+            candidate.college == viewer.college,
+            and_(
+                func.cardinality(viewer.otherColleges) > 0,
+                candidate.otherColleges.contains(array([viewer.college]))
+            )
+        ),
+        # Match if the candidate's majors overlap with the viewer's preferred majors
+        or_(
+            func.cardinality(viewer.majors) == 0,
+            candidate.majors.overlap(viewer.majors)
+        ),
+    ]
+
+    # The viewer also has to fit what the candidate is looking for
+    mutualCompatibilityFilters = [
+        or_(
+            candidate.genderPref == "Everyone",
+            candidate.genderPref == viewer.gender,
+            candidate.genderPref.is_(None)
+        ),
+        and_(
+            or_(candidate.minAge.is_(None), candidate.minAge <= viewer.age),
+            or_(candidate.maxAge.is_(None), candidate.maxAge >= viewer.age)
+        ),
+        or_(
+            candidate.college == viewer.college,
+            candidate.otherColleges.contains(array([viewer.college])),
+            func.cardinality(candidate.otherColleges) == 0
+        ),
+    ]
+
+    return [
+        candidate.id != viewer.id,
+        candidate.moderationStatus == "Approved",
+        # Liked profiles never re-enter the pool
+        not_(exists().where(
+            Swipe.userId == viewer.id,
+            Swipe.targetId == candidate.id,
+            Swipe.isLike == True
+        )),
+        *preferenceFilters,
+        *mutualCompatibilityFilters,
+    ]
+
+def _insertPairs(db: Session, *conditions):
+    pairs = select(Viewer.id, Candidate.id).where(*conditions, *compatibilityFilters())
+    db.execute(insert(CandidatePool).from_select(["viewerId", "candidateId"], pairs))
+
+def scorePool(db: Session, *conditions):
+    # Ranking runs when pairs enter the pool, so discovery reads just ORDER BY score
+    pairs = db.execute(
+        select(
+            CandidatePool.viewerId, CandidatePool.candidateId,
+            *[getattr(Viewer, f) for f in FEATURES], *[getattr(Candidate, f) for f in FEATURES]
+        )
+        .join(Viewer, Viewer.id == CandidatePool.viewerId)
+        .join(Candidate, Candidate.id == CandidatePool.candidateId)
+        .where(*conditions)
+    ).all()
+    if not pairs:
+        return
+
+    strengths = loadStrengths(db, {pair[0] for pair in pairs})
+    width = len(FEATURES)
+    for start in range(0, len(pairs), SCORE_BATCH_SIZE):
+        batch = pairs[start:start + SCORE_BATCH_SIZE]
+        scores = scorePairs(
+            [dict(zip(FEATURES, pair[2:2 + width])) for pair in batch],
+            [dict(zip(FEATURES, pair[2 + width:])) for pair in batch],
+            weightsFor([pair[0] for pair in batch], strengths)
+        )
+        db.execute(update(CandidatePool), [
+            {"viewerId": pair[0], "candidateId": pair[1], "score": float(score)}
+            for pair, score in zip(batch, scores)
+        ])
+
+def rebuildViewerPool(db: Session, viewerId: int):
+    db.flush()
+    db.execute(delete(CandidatePool).where(CandidatePool.viewerId == viewerId))
+    _insertPairs(db, Viewer.id == viewerId)
+    scorePool(db, CandidatePool.viewerId == viewerId)
+    poolSize = select(func.count()).where(CandidatePool.viewerId == viewerId).scalar_subquery()
+    db.execute(
+        pg_insert(CandidatePoolState).values(userId=viewerId, poolSize=poolSize, countedAt=func.now()).on_conflict_do_update(
+            index_elements=["userId"], set_={"builtAt": func.now(), "poolSize": poolSize, "countedAt": func.now()}
+        )
+    )
+
+def refreshCandidate(db: Session, candidateId: int):
+    # Re-place one user in every already-built pool after their profile/preferences change
+    db.flush()
+    db.execute(delete(CandidatePool).where(CandidatePool.candidateId == candidateId))
+    _insertPairs(
+        db,
+        Candidate.id == candidateId,
+        exists().where(CandidatePoolState.userId == Viewer.id)
+    )
+    scorePool(db, CandidatePool.candidateId == candidateId)
+
+def refreshUser(db: Session, userId: int):
+    # A user is both a viewer (their own preferences) and a candidate (in others' pools)
+    rebuildViewerPool(db, userId)
+    refreshCandidate(db, userId)
+
+def rescoreUser(db: Session, userId: int):
+    # Same pairs, new scores: both the user's own pool and their place in everyone else's
+    db.flush()
+    scorePool(db, CandidatePool.viewerId == userId)
+    scorePool(db, CandidatePool.candidateId == userId)
+
+def refreshChangedUser(db: Session, userId: int, changedFields):
+    # Full re-filtering only when a filtered column changed; other edits (bio, pronouns, ...) touch no pool
+    if changedFields & FILTER_FIELDS:
+        refreshUser(db, userId)
+    elif changedFields & set(FEATURES):
+        rescoreUser(db, userId)
+
+def removeCandidates(db: Session, viewerId: int, candidateIds):
+    removed = db.execute(delete(CandidatePool).where(
+        CandidatePool.viewerId == viewerId,
+        CandidatePool.candidateId.in_(candidateIds)
+    )).rowcount
+    if removed:
+        db.execute(update(CandidatePoolState).where(CandidatePoolState.userId == viewerId).values(
+            poolSize=CandidatePoolState.poolSize - removed
+        ))
+
+def removeUser(db: Session, userId: int):
+    db.execute(delete(CandidatePool).where(
+        or_(CandidatePool.viewerId == userId, CandidatePool.candidateId == userId)
+    ))
+    db.execute(delete(CandidatePoolState).where(CandidatePoolState.userId == userId))
+
+def ensureViewerPool(db: Session, viewerId: int):
+    # Pools are built lazily the first time a viewer hits discovery
+    if db.get(CandidatePoolState, viewerId) is None:
+        try:
+            rebuildViewerPool(db, viewerId)
+            db.commit()
+        except IntegrityError:
+            # A concurrent request built it first
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to build candidate pool for user {viewerId}: {e}")
+            raise
+
+def poolQuery(viewerId: int):
+    return select(User).join(
+        CandidatePool, CandidatePool.candidateId == User.id
+    ).where(CandidatePool.viewerId == viewerId)
@@ -0,0 +1,124 @@
+import os
+import zlib
+import logging
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Brotli is optional; without it responses are gzip-compressed only
+    import brotli
+except ImportError:
+    brotli = None
+    logger.warning("brotli not installed. Responses will only be gzip-compressed.")
+
+# Compresses JSON/text responses at or above a size threshold, with the first encoding in
+# COMPRESSION_ENCODINGS the client accepts. Images are already compressed and pass through.
+COMPRESSION_ENCODINGS = [encoding.strip().lower() for encoding in os.getenv('COMPRESSION_ENCODINGS', 'br,gzip').split(',') if encoding.strip()]  # In order of preference; empty disables
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))  # Bytes; smaller bodies aren't worth the CPU
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))  # 0-11; higher levels are too slow for per-request compression
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+SUPPORTED_ENCODINGS = [encoding for encoding in COMPRESSION_ENCODINGS if encoding == "gzip" or (encoding == "br" and brotli is not None)]
+
+def chooseEncoding(acceptEncoding: str) -> Optional[str]:
+    accepted = {}
+    for item in acceptEncoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def _compressor(encoding: str):
+    # (compress, finish) pair for one response body
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return compressor.compress, compressor.flush
+
+class CompressionMiddleware:
+
+    def __init__(self, app, minimumSize: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimumSize = minimumSize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = chooseEncoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.minimumSize).send)
+
+class _CompressingSender:
+    # Holds back the response start until the first body chunk shows whether compressing is worth it
+
+    def __init__(self, send, encoding: str, minimumSize: int):
+        self.downstream = send
+        self.encoding = encoding
+        self.minimumSize = minimumSize
+        self.start = None
+        self.passthrough = False
+        self.compress = self.finish = None
+
+    async def send(self, message):
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self.downstream(message)
+            else:
+                self.start = message
+            return
+
+        body = message.get("body", b"")
+        moreBody = message.get("more_body", False)
+        if self.compress is None:
+            if not moreBody and len(body) < self.minimumSize:
+                self.passthrough = True
+                await self.downstream(self.start)
+                await self.downstream(message)
+                return
+
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes differ from what a strong ETag names; If-None-Match compares weakly
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            del headers["Content-Length"]
+            self.compress, self.finish = _compressor(self.encoding)
+
+            if not moreBody:
+                data = self.compress(body) + self.finish()
+                headers["Content-Length"] = str(len(data))
+                await self.downstream(self.start)
+                await self.downstream({"type": "http.response.body", "body": data})
+                return
+            await self.downstream(self.start)
+
+        # Streamed body: compressed chunk by chunk
+        data = self.compress(body)
+        if not moreBody:
+            data += self.finish()
+        await self.downstream({"type": "http.response.body", "body": data, "more_body": moreBody})
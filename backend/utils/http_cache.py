@@ -0,0 +1,27 @@
+import hashlib
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+# Conditional GETs: the ETag is a hash of the response body, so it changes exactly when the
+# content does. Responses are per user, so only the browser's private cache may keep them,
+# and it must revalidate every time (a 304 costs no body).
+# The tag is weak and the response varies by Accept-Encoding: compression middleware may send
+# these bodies gzip/br encoded, and a 304 must carry the same validators as the 200 it revalidates.
+CACHE_CONTROL = "private, no-cache"
+
+def etagFor(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def _matches(ifNoneMatch: Optional[str], etag: str) -> bool:
+    # Weak comparison (RFC 9110)
+    if not ifNoneMatch:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in ifNoneMatch.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def conditionalResponse(request: Request, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    etag = etagFor(body)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
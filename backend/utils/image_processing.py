@@ -0,0 +1,84 @@
+import os
+import asyncio
+import logging
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+try:
+    # HEIC/HEIF (iPhone photos) decode only with the optional pillow-heif plugin
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    logger.warning("pillow-heif not installed. HEIC/HEIF uploads will be rejected.")
+
+# Variants written for every upload: longest side in pixels (never upscaled), all WebP
+VARIANT_SIZES = {"small": 200, "medium": 600, "large": 1200}
+WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', min(os.cpu_count() or 1, 4)))
+MAX_PIXELS = 40_000_000  # Reject decompression bombs before decoding them
+# Part of every content hash, so changing the variant settings never reuses an old (immutable) URL
+VARIANT_SPEC = "webp:q{}:{}".format(WEBP_QUALITY, ",".join(str(size) for size in sorted(VARIANT_SIZES.values())))
+
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+class InvalidImageError(ValueError):
+    pass
+
+def renderVariants(sourcePath: str, outputDir: str, baseName: str) -> Dict[str, str]:
+    # Runs in a worker process. Output is re-encoded pixels only, so EXIF (GPS, device)
+    # and other metadata from the original never reach disk
+    try:
+        with Image.open(sourcePath) as original:
+            # JPEGs can decode straight at a reduced scale when the source is much larger
+            original.draft("RGB", (max(VARIANT_SIZES.values()),) * 2)
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning, OSError, SyntaxError) as e:
+        raise InvalidImageError(str(e))
+
+    hasAlpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if hasAlpha else "RGB")
+
+    paths = {}
+    try:
+        # Largest first, so each smaller variant resamples from an already reduced image
+        for name, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = os.path.join(outputDir, f"{baseName}_{size}.webp")
+            image.save(path, "WEBP", quality=WEBP_QUALITY, method=4)
+            paths[name] = path
+    except Exception:
+        for path in paths.values():
+            removeFile(path)
+        raise
+    return paths
+
+def removeFile(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+_executor = None
+
+def _getExecutor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+async def processUpload(sourcePath: str, outputDir: str, baseName: str) -> Dict[str, str]:
+    # Decoding and resizing are CPU bound; keep them off the event loop and out of the GIL
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_getExecutor(), renderVariants, sourcePath, outputDir, baseName)
+
+def shutdownExecutor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -6,9 +6,12 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached, noload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.user import User
+from utils.user_cache import getCachedUser, cacheUser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -63,28 +66,51 @@ def verifyToken(token: str) -> Optional[str]:
         logger.error(f"Token verification error: {e}")
         return None
 
-def getCurrentUser(
+class Principal:
+    # Just enough of the authenticated user for routes that only need its id
+
+    __slots__ = ("id", "email")
+
+    def __init__(self, id: int, email: str):
+        self.id = id
+        self.email = email
+
+async def _authenticatedRow(credentials: HTTPAuthorizationCredentials, db: AsyncSession) -> dict:
+    email = verifyToken(credentials.credentials)
+    if email is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Cached row first; Postgres only on a miss
+    row = getCachedUser(email)
+    if row is not None:
+        return row
+    
+    user = (await db.execute(
+        select(User).options(noload(User.images)).where(User.email == email)
+    )).scalars().first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return cacheUser(user)
+
+async def getCurrentUser(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     try:
-        email = verifyToken(credentials.credentials)
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        return user
+        row = await _authenticatedRow(credentials, db)
+        # Rebuild the row as a persistent instance in this session without a SELECT
+        user = User(**row)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
     except HTTPException:
         raise
     except Exception as e:
@@ -93,4 +119,21 @@ def getCurrentUser(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication failed",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+async def getCurrentPrincipal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    try:
+        row = await _authenticatedRow(credentials, db)
+        return Principal(id=row["id"], email=row["email"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get current principal error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication failed",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,31 @@
+import base64
+import json
+import logging
+from typing import Optional
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# Cursors are opaque to clients: url-safe base64 of a small JSON payload.
+# Callers decide what goes inside (seed, last sort key, last id, ...)
+
+def encodeCursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decodeCursor(cursor: Optional[str]) -> Optional[dict]:
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, dict):
+            raise ValueError("cursor payload must be an object")
+        return payload
+    except Exception as e:
+        logger.debug(f"Invalid pagination cursor {cursor!r}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
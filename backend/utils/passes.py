@@ -0,0 +1,72 @@
+import os
+import time
+import logging
+import threading
+from typing import Iterable, Set
+from utils.auth import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Passed profiles stay out of discovery for a cooldown, then resurface. Each user's passes are a
+# Redis sorted set of target IDs scored by when they resurface, so expired entries are trimmed
+# by score and discovery reads only the live ones. Without Redis they are kept per worker.
+PASS_COOLDOWN_SECONDS = int(os.getenv('PASS_COOLDOWN_SECONDS', 7 * 24 * 3600))
+LOCAL_PASS_USERS = int(os.getenv('LOCAL_PASS_USERS', 10000))
+
+_localPasses = {}  # userId -> {targetId: resurfaceAt}, oldest user first
+_localLock = threading.Lock()
+
+def _redisKey(userId: int) -> str:
+    return f"passes:{userId}"
+
+def recordPasses(userId: int, targetIds: Iterable[int]):
+    resurfaceAt = time.time() + PASS_COOLDOWN_SECONDS
+    entries = {targetId: resurfaceAt for targetId in targetIds}
+    if not entries:
+        return
+
+    if redis_client is not None:
+        try:
+            key = _redisKey(userId)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zadd(key, entries)
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            # The whole set expires with its newest pass
+            pipe.expire(key, PASS_COOLDOWN_SECONDS)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.error(f"Failed to record passes in Redis: {e}")
+
+    with _localLock:
+        passes = _localPasses.pop(userId, {})
+        passes.update(entries)
+        _localPasses[userId] = passes
+        while len(_localPasses) > LOCAL_PASS_USERS:
+            _localPasses.pop(next(iter(_localPasses)))
+
+def recentPasses(userId: int) -> Set[int]:
+    now = time.time()
+    if redis_client is not None:
+        try:
+            return {int(targetId) for targetId in redis_client.zrangebyscore(_redisKey(userId), now, "+inf")}
+        except Exception as e:
+            # Showing a passed profile again is harmless; failing discovery isn't
+            logger.error(f"Failed to read passes from Redis: {e}")
+
+    with _localLock:
+        passes = _localPasses.get(userId)
+        if not passes:
+            return set()
+        live = {targetId: resurfaceAt for targetId, resurfaceAt in passes.items() if resurfaceAt > now}
+        _localPasses[userId] = live
+        return set(live)
+
+def clearPasses(userId: int):
+    with _localLock:
+        _localPasses.pop(userId, None)
+    if redis_client is not None:
+        try:
+            redis_client.delete(_redisKey(userId))
+        except Exception as e:
+            logger.error(f"Failed to clear passes in Redis: {e}")
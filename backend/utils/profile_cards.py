@@ -0,0 +1,110 @@
+import os
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.orm import load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.user import User
+from schemas.user import UserResponse
+from utils.auth import redis_client
+from utils.user_cache import TTLCache
+from utils.storage import storage, S3Storage
+
+logger = logging.getLogger(__name__)
+
+# Profile cards (UserCard or UserResponse JSON) rendered once and kept as bytes, keyed by schema and
+# (userId, profileVersion). Everything that changes a card bumps User.profileVersion in the same
+# transaction, so feeds only ever ask for the current version and stale cards simply age out.
+# Per-worker LRU in front of Redis.
+CARD_CACHE_TTL = int(os.getenv('CARD_CACHE_TTL', 3600))
+CARD_CACHE_SIZE = int(os.getenv('CARD_CACHE_SIZE', 10000))
+USE_REDIS = os.getenv('CARD_CACHE_REDIS', 'true').lower() == 'true'
+
+# Cards embed image URLs; presigned ones must still be valid for a while after the card is served
+if isinstance(storage, S3Storage) and not storage.publicUrl:
+    CARD_CACHE_TTL = min(CARD_CACHE_TTL, storage.presignSeconds // 2)
+
+CardRef = Tuple[int, int]  # (userId, profileVersion)
+
+_local = TTLCache(CARD_CACHE_SIZE, CARD_CACHE_TTL)
+
+def _redisKey(schema: Type[BaseModel], ref: CardRef) -> str:
+    return f"card:{schema.__name__}:{ref[0]}:{ref[1]}"
+
+def _columns(schema: Type[BaseModel]):
+    # Misses load only the columns the schema renders (images come with the selectin load)
+    return [User.profileVersion] + [getattr(User, name) for name in schema.model_fields if name in User.__table__.columns]
+
+async def bumpProfileVersion(db: AsyncSession, userId: int):
+    # Call inside the transaction that changes the profile or its images
+    await db.execute(update(User).where(User.id == userId).values(profileVersion=User.profileVersion + 1))
+
+def renderCard(user: User, schema: Type[BaseModel] = UserResponse) -> bytes:
+    return schema.model_validate(user).model_dump_json().encode()
+
+def _store(schema: Type[BaseModel], cards: Dict[CardRef, bytes]):
+    for ref, card in cards.items():
+        _local.set((schema.__name__, *ref), card)
+    if USE_REDIS and redis_client is not None and cards:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for ref, card in cards.items():
+                pipe.setex(_redisKey(schema, ref), CARD_CACHE_TTL, card.decode())
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to cache profile cards in Redis: {e}")
+
+async def profileCardMap(db: AsyncSession, refs: Iterable[CardRef], schema: Type[BaseModel] = UserResponse) -> Dict[CardRef, bytes]:
+    # Misses are loaded in one query; users gone by then are left out
+    cards = {}
+    missing = []
+    for ref in refs:
+        card = _local.get((schema.__name__, *ref))
+        if card is None:
+            missing.append(ref)
+        else:
+            cards[ref] = card
+
+    if missing and USE_REDIS and redis_client is not None:
+        try:
+            values = redis_client.mget([_redisKey(schema, ref) for ref in missing])
+        except Exception as e:
+            logger.error(f"Failed to read profile cards from Redis: {e}")
+            values = [None] * len(missing)
+        stillMissing = []
+        for ref, value in zip(missing, values):
+            if value is None:
+                stillMissing.append(ref)
+            else:
+                cards[ref] = value.encode()
+                _local.set((schema.__name__, *ref), cards[ref])
+        missing = stillMissing
+
+    if missing:
+        users = (await db.scalars(select(User).options(load_only(*_columns(schema))).where(
+            User.id.in_({userId for userId, _ in missing})
+        ))).all()
+        rendered = {(user.id, user.profileVersion): renderCard(user, schema) for user in users}
+        _store(schema, rendered)
+        # A profile edited since the feed query read its version comes back newer; serve that one
+        byUser = {userId: card for (userId, _), card in rendered.items()}
+        for ref in missing:
+            if ref[0] in byUser:
+                cards[ref] = byUser[ref[0]]
+
+    return cards
+
+async def profileCards(db: AsyncSession, refs: Iterable[CardRef], schema: Type[BaseModel] = UserResponse) -> List[bytes]:
+    # Cards in the order of refs
+    refs = list(refs)
+    cards = await profileCardMap(db, refs, schema)
+    return [cards[ref] for ref in refs if ref in cards]
+
+async def profileCard(db: AsyncSession, ref: CardRef, schema: Type[BaseModel] = UserResponse) -> Optional[bytes]:
+    return (await profileCardMap(db, [ref], schema)).get(ref)
+
+def cardListResponse(cards: Iterable[bytes], headers: Optional[Dict[str, str]] = None) -> Response:
+    # Fragments are already JSON; only the list around them is added
+    return Response(content=b"[" + b",".join(cards) + b"]", media_type="application/json", headers=headers)
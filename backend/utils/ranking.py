@@ -0,0 +1,101 @@
+import numpy as np
+from typing import Dict, List, Sequence
+from sqlalchemy.orm import Session
+from models.preference import PreferenceStrength
+
+# Signals scored for each (viewer, candidate) pair, and the PreferenceStrength
+# category that weights each one. Categories a viewer never set weigh DEFAULT_STRENGTH.
+SIGNALS = ["interests", "classes", "major", "age", "college", "lifestyle"]
+SIGNAL_CATEGORIES = {
+    "interests": "interests",
+    "classes": "classes",
+    "major": "major",
+    "age": "age",
+    "college": "location",
+    "lifestyle": "lifestyle",
+}
+DEFAULT_STRENGTH = 1.0
+AGE_SCALE = 10.0  # An age gap this large (or larger) scores 0 on the age signal
+SCORE_PRECISION = 4  # Rounded so near-equal scores tie and fall back to the seeded shuffle
+FEATURES = ["age", "college", "major", "majors", "interests", "classes", "smokes", "drinks"]
+
+def loadStrengths(db: Session, userIds: Sequence[int]) -> Dict[int, np.ndarray]:
+    rows = db.query(
+        PreferenceStrength.userId, PreferenceStrength.category, PreferenceStrength.strength
+    ).filter(PreferenceStrength.userId.in_(set(userIds))).all()
+
+    columns = {}
+    for i, signal in enumerate(SIGNALS):
+        columns.setdefault(SIGNAL_CATEGORIES[signal], []).append(i)
+
+    strengths = {}
+    for userId, category, strength in rows:
+        weights = strengths.setdefault(userId, np.full(len(SIGNALS), DEFAULT_STRENGTH))
+        for i in columns.get(category.lower(), []):
+            weights[i] = min(max(strength, 0.0), 1.0)
+    return strengths
+
+def _multiHot(lists: List[Sequence[str]], vocabulary: Dict[str, int]) -> np.ndarray:
+    rows = np.repeat(np.arange(len(lists)), [len(values) for values in lists])
+    cols = np.fromiter(
+        (vocabulary.setdefault(v.strip().lower(), len(vocabulary)) for values in lists for v in values),
+        dtype=np.int64, count=len(rows)
+    )
+    matrix = np.zeros((len(lists), max(len(vocabulary), 1)), dtype=bool)
+    matrix[rows, cols] = True
+    return matrix
+
+def _jaccard(left: List[Sequence[str]], right: List[Sequence[str]]) -> np.ndarray:
+    vocabulary = {}
+    a = _multiHot(left, vocabulary)
+    b = _multiHot(right, vocabulary)
+    # Vocabulary may have grown while encoding right; pad left to match
+    a = np.pad(a, ((0, 0), (0, b.shape[1] - a.shape[1])))
+    intersection = (a & b).sum(axis=1)
+    union = (a | b).sum(axis=1)
+    return np.divide(intersection, union, out=np.zeros(len(left)), where=union > 0)
+
+def _codes(*columns: List[str]) -> List[np.ndarray]:
+    vocabulary = {}
+    return [
+        np.array([vocabulary.setdefault((v or "").strip().lower(), len(vocabulary)) for v in column])
+        for column in columns
+    ]
+
+def scorePairs(viewers: List[dict], candidates: List[dict], weights: np.ndarray) -> np.ndarray:
+    # viewers[i] is scoring candidates[i]; weights is (pairs x SIGNALS).
+    # Returns a 0..1 weighted average of the signals for each pair.
+    n = len(viewers)
+    if n == 0:
+        return np.zeros(0)
+
+    viewerCollege, candidateCollege = _codes(
+        [v["college"] for v in viewers], [c["college"] for c in candidates]
+    )
+    # A major match is the candidate's major being one the viewer asked for,
+    # or the viewer's own major when they didn't ask for any
+    preferredMajors = [v["majors"] or [v["major"]] for v in viewers]
+    majorMatch = _jaccard(preferredMajors, [[c["major"]] for c in candidates]) > 0
+
+    ageGap = np.abs(
+        np.array([v["age"] for v in viewers], dtype=float) - np.array([c["age"] for c in candidates], dtype=float)
+    )
+    smokes = np.array([[bool(v["smokes"]), bool(c["smokes"])] for v, c in zip(viewers, candidates)])
+    drinks = np.array([[bool(v["drinks"]), bool(c["drinks"])] for v, c in zip(viewers, candidates)])
+
+    signals = np.column_stack([
+        _jaccard([v["interests"] or [] for v in viewers], [c["interests"] or [] for c in candidates]),
+        _jaccard([v["classes"] or [] for v in viewers], [c["classes"] or [] for c in candidates]),
+        majorMatch,
+        1.0 - np.minimum(ageGap / AGE_SCALE, 1.0),
+        viewerCollege == candidateCollege,
+        ((smokes[:, 0] == smokes[:, 1]).astype(float) + (drinks[:, 0] == drinks[:, 1])) / 2.0,
+    ]).astype(float)
+
+    totals = weights.sum(axis=1)
+    scores = np.divide((signals * weights).sum(axis=1), totals, out=np.zeros(n), where=totals > 0)
+    return np.round(scores, SCORE_PRECISION)
+
+def weightsFor(viewerIds: Sequence[int], strengths: Dict[int, np.ndarray]) -> np.ndarray:
+    default = np.full(len(SIGNALS), DEFAULT_STRENGTH)
+    return np.array([strengths.get(viewerId, default) for viewerId in viewerIds]).reshape(-1, len(SIGNALS))
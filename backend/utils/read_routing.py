@@ -0,0 +1,54 @@
+import os
+import logging
+from typing import Optional
+from fastapi import Depends
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from database import asyncEngine, asyncSession, readEngine, readSession
+from utils.auth import redis_client
+from utils.jwt_auth import verifyToken
+from utils.user_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Read-only handlers use the replica, except for a user who changed something recently:
+# their reads stay on the primary until the replica has surely caught up (read-your-writes).
+# Writes are marked per worker and in Redis so the next request can land on any worker.
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 10))  # Keep above the worst replica lag
+USE_REPLICA = readEngine is not asyncEngine
+
+_recentWrites = TTLCache(10000, READ_YOUR_WRITES_SECONDS)
+optionalSecurity = HTTPBearer(auto_error=False)
+
+def _redisKey(email: str) -> str:
+    return f"recentwrite:{email}"
+
+def markRecentWrite(email: str):
+    if not USE_REPLICA:
+        return
+    _recentWrites.set(email, True)
+    if redis_client is not None:
+        try:
+            redis_client.setex(_redisKey(email), READ_YOUR_WRITES_SECONDS, 1)
+        except Exception as e:
+            logger.error(f"Failed to record recent write in Redis: {e}")
+
+def wroteRecently(email: str) -> bool:
+    if _recentWrites.get(email):
+        return True
+    if redis_client is not None:
+        try:
+            return bool(redis_client.exists(_redisKey(email)))
+        except Exception as e:
+            # Can't tell, so stay consistent
+            logger.error(f"Failed to read recent write from Redis: {e}")
+            return True
+    return False
+
+async def get_read_db(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optionalSecurity)):
+    # Routing only needs the token subject; the handler's own auth dependency still validates the user
+    email = verifyToken(credentials.credentials) if credentials else None
+    sessionFactory = readSession
+    if USE_REPLICA and email is not None and wroteRecently(email):
+        sessionFactory = asyncSession
+    async with sessionFactory() as db:
+        yield db
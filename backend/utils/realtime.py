@@ -0,0 +1,167 @@
+import os
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from utils.auth import redis_client
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "realtime:events"
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = float(os.getenv('REALTIME_RECONNECT_MAX_SECONDS', 30))
+
+class ConnectionManager:
+    # Open sockets on this worker, keyed by user id (a user can have several tabs/devices)
+
+    def __init__(self):
+        self.connections: Dict[int, Set[WebSocket]] = {}
+
+    def connect(self, userId: int, websocket: WebSocket):
+        self.connections.setdefault(userId, set()).add(websocket)
+
+    def disconnect(self, userId: int, websocket: WebSocket):
+        sockets = self.connections.get(userId)
+        if sockets:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.connections[userId]
+
+    async def sendLocal(self, userIds: Iterable[int], event: dict):
+        for userId in userIds:
+            for websocket in list(self.connections.get(userId, ())):
+                try:
+                    await websocket.send_json(event)
+                except Exception as e:
+                    logger.debug(f"Dropping dead websocket for user {userId}: {e}")
+                    self.disconnect(userId, websocket)
+
+manager = ConnectionManager()
+_redis = redis_client  # Swappable for an in-process fake via startListener(client=...)
+_listenerTask = None
+_loop = None
+_channelHandlers: Dict[str, Callable[[dict], None]] = {}  # Other cross-worker state, e.g. utils/swipe_graph.py
+_subscriptionHooks: List[Tuple[Optional[Callable[[], None]], Optional[Callable[[], None]]]] = []
+_hookTasks = set()
+
+def addChannel(channel: str, handler: Callable[[dict], None], onLost: Optional[Callable[[], None]] = None,
+               onRestored: Optional[Callable[[], None]] = None):
+    # Register before startListener(); handlers get each decoded payload, including this worker's own.
+    # State kept in step over the channel misses updates while the subscription is down: onLost runs
+    # when it drops, onRestored (in a worker thread) once it is back, e.g. to reload from the database
+    _channelHandlers[channel] = handler
+    if onLost is not None or onRestored is not None:
+        _subscriptionHooks.append((onLost, onRestored))
+
+def _subscriptionLost():
+    for onLost, _ in _subscriptionHooks:
+        if onLost is not None:
+            try:
+                onLost()
+            except Exception:
+                logger.exception("Realtime onLost hook failed")
+
+def _subscriptionRestored():
+    for _, onRestored in _subscriptionHooks:
+        if onRestored is not None:
+            # Off the listener, so events keep flowing while the hook reloads
+            task = asyncio.create_task(asyncio.to_thread(onRestored))
+            _hookTasks.add(task)
+            task.add_done_callback(_hookDone)
+
+def _hookDone(task):
+    _hookTasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Realtime onRestored hook failed", exc_info=task.exception())
+
+def publishEvent(userIds: Iterable[int], event: dict):
+    # Every worker subscribes to the channel and delivers to the sockets it holds.
+    # Without Redis there is only this worker to deliver to.
+    userIds = list(userIds)
+    if _redis is not None:
+        try:
+            _redis.publish(EVENTS_CHANNEL, json.dumps({"userIds": userIds, "event": event}, default=str))
+            return
+        except Exception as e:
+            logger.error(f"Failed to publish realtime event, delivering locally only: {e}")
+
+    try:
+        asyncio.get_running_loop().create_task(manager.sendLocal(userIds, event))
+    except RuntimeError:
+        # Called from a worker thread rather than the event loop
+        if _loop is not None:
+            asyncio.run_coroutine_threadsafe(manager.sendLocal(userIds, event), _loop)
+
+def publishToChannel(channel: str, payload: dict):
+    # Fan-out for addChannel() handlers; without Redis there are no other workers to tell
+    if _redis is None:
+        return
+    try:
+        _redis.publish(channel, json.dumps(payload, default=str))
+    except Exception as e:
+        logger.error(f"Failed to publish to {channel}: {e}")
+
+async def _receive(pubsub, connections: ConnectionManager):
+    while True:
+        # The client is synchronous; poll it off the event loop
+        message = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+        if not message or message.get("type") != "message":
+            continue
+        channel = message.get("channel")
+        try:
+            payload = json.loads(message["data"])
+            if channel in _channelHandlers:
+                _channelHandlers[channel](payload)
+            else:
+                await connections.sendLocal(payload["userIds"], payload["event"])
+        except Exception as e:
+            logger.error(f"Bad realtime event on {channel}: {e}")
+
+async def _listen(client, connections: ConnectionManager):
+    # Runs until cancelled: a dropped Redis connection is logged and the subscription
+    # is set up again, backing off up to RECONNECT_MAX_SECONDS between attempts
+    delay = RECONNECT_MIN_SECONDS
+    lost = False
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await asyncio.to_thread(pubsub.subscribe, EVENTS_CHANNEL, *_channelHandlers)
+            delay = RECONNECT_MIN_SECONDS
+            if lost:
+                lost = False
+                logger.info("Realtime subscription restored")
+                _subscriptionRestored()
+            await _receive(pubsub, connections)
+        except Exception:
+            logger.exception(f"Realtime subscription lost, resubscribing in {delay:g}s")
+            if not lost:
+                lost = True
+                _subscriptionLost()
+        finally:
+            try:
+                await asyncio.to_thread(pubsub.close)
+            except Exception:
+                pass
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+async def startListener(client=None):
+    global _redis, _listenerTask, _loop
+    _loop = asyncio.get_running_loop()
+    if client is not None:
+        _redis = client
+    if _redis is None:
+        logger.warning("Redis not available. Realtime events are delivered within this worker only.")
+        return
+    _listenerTask = asyncio.create_task(_listen(_redis, manager))
+
+async def stopListener():
+    global _listenerTask
+    if _listenerTask is not None:
+        _listenerTask.cancel()
+        try:
+            await _listenerTask
+        except asyncio.CancelledError:
+            pass
+        _listenerTask = None
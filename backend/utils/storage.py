@@ -0,0 +1,108 @@
+import os
+import shutil
+import asyncio
+import logging
+from typing import Optional
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+# Where image files live. The database stores storage keys (e.g. "images/<content hash>_600.webp");
+# clients get URLs from Storage.url(), so with S3 or a CDN the API never serves image bytes.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local').lower()  # local | s3
+STORAGE_PUBLIC_URL = os.getenv('STORAGE_PUBLIC_URL', '').rstrip('/')  # CDN/static host in front of the files
+LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', 'uploads')
+S3_BUCKET = os.getenv('S3_BUCKET')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # MinIO or another S3-compatible service
+S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+S3_PRESIGN_SECONDS = int(os.getenv('S3_PRESIGN_SECONDS', 3600))
+# Image keys never change content (content-addressed or unique names), so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class LocalStorage:
+    # Files under LOCAL_STORAGE_ROOT, served by main.py's /uploads mount unless a public URL is set
+
+    def __init__(self, root: str, publicUrl: str = ""):
+        self.root = root
+        self.publicUrl = publicUrl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put(self, localPath: str, key: str, contentType: str):
+        # A rename when the work directory is on the same filesystem, a copy otherwise
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await asyncio.to_thread(shutil.move, localPath, path)
+
+    def servesPath(self, path: str) -> bool:
+        # Whether path is inside the root (publicly served by main.py unless a public URL is set)
+        if self.publicUrl:
+            return False
+        root = os.path.realpath(self.root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    async def delete(self, key: str):
+        try:
+            await asyncio.to_thread(os.remove, self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key: str) -> str:
+        if self.publicUrl:
+            return f"{self.publicUrl}/{key}"
+        return f"{self.root}/{key}"
+
+class S3Storage:
+    # Any S3-compatible object store; URLs are CDN URLs when STORAGE_PUBLIC_URL is set, presigned otherwise
+
+    def __init__(self, bucket: str, endpointUrl: Optional[str], region: str, publicUrl: str = "", presignSeconds: int = 3600):
+        import boto3
+        self.bucket = bucket
+        self.publicUrl = publicUrl
+        self.presignSeconds = presignSeconds
+        # Credentials come from the standard AWS environment variables / config chain
+        self.client = boto3.client("s3", endpoint_url=endpointUrl, region_name=region)
+
+    async def put(self, localPath: str, key: str, contentType: str):
+        await asyncio.to_thread(
+            self.client.upload_file, localPath, self.bucket, key,
+            ExtraArgs={"ContentType": contentType, "CacheControl": IMMUTABLE_CACHE_CONTROL}
+        )
+        os.remove(localPath)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def url(self, key: str) -> str:
+        if self.publicUrl:
+            return f"{self.publicUrl}/{key}"
+        # Signing is local computation, no request to the object store
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.presignSeconds
+        )
+
+class ImmutableStaticFiles(StaticFiles):
+    # StaticFiles already sends ETag/Last-Modified and answers If-None-Match with 304
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+def createStorage():
+    if STORAGE_BACKEND == 's3':
+        if not S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Storage(S3_BUCKET, S3_ENDPOINT_URL, S3_REGION, STORAGE_PUBLIC_URL, S3_PRESIGN_SECONDS)
+    if STORAGE_BACKEND != 'local':
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return LocalStorage(LOCAL_STORAGE_ROOT, STORAGE_PUBLIC_URL)
+
+storage = createStorage()
+
+def storageUrl(key: Optional[str]) -> Optional[str]:
+    # Rows written before keys were stored may already hold a full URL
+    if not key or key.startswith(("http://", "https://")):
+        return key
+    return storage.url(key)
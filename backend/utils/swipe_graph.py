@@ -0,0 +1,278 @@
+import os
+import sys
+import struct
+import asyncio
+import logging
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select, func
+from database import localSession
+from models.swipe import Swipe
+from utils import realtime
+
+logger = logging.getLogger(__name__)
+
+# Every like, held in memory per worker as sorted int32 arrays in both directions
+# (liked[userId] and likedBy[targetId]), so "already liked" checks and liked-ID exclusion
+# need no query. Loaded at startup, updated after each committed like and kept in step
+# across workers over Redis. The database stays the source of truth: match creation
+# still happens in the like statement itself (routes/interactions.py).
+SNAPSHOT_PATH = os.getenv('SWIPE_GRAPH_SNAPSHOT', '')  # Binary snapshot for fast restarts; empty disables
+GRAPH_CHANNEL = "swipegraph:updates"
+LOAD_BATCH_SIZE = 50000
+
+_MAGIC = b"SWPG"
+_HEADER = struct.Struct("<4sHqq")  # magic, version, loadedThrough (swipe id), pair count
+
+def _contains(values: array, value: int) -> bool:
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+def _insert(index: Dict[int, array], key: int, value: int):
+    values = index.get(key)
+    if values is None:
+        index[key] = array('i', [value])
+        return
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        values.insert(position, value)
+
+def _remove(index: Dict[int, array], key: int, value: int):
+    values = index.get(key)
+    if values is None:
+        return
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+        if not values:
+            del index[key]
+
+class SwipeGraph:
+
+    def __init__(self):
+        self.liked: Dict[int, array] = {}
+        self.likedBy: Dict[int, array] = {}
+        self.loaded = False
+        self.loadedThrough = 0  # Highest swipe id read from the database; catch-up after a restore starts here
+        self.pending = None  # Updates that arrive while a load is building new arrays, replayed onto them
+        self.lock = threading.Lock()
+
+    def _addLikes(self, userId: int, targetIds: Iterable[int]):
+        for targetId in targetIds:
+            _insert(self.liked, userId, targetId)
+            _insert(self.likedBy, targetId, userId)
+
+    def _forgetUser(self, userId: int):
+        for targetId in self.liked.pop(userId, ()):
+            _remove(self.likedBy, targetId, userId)
+        for likerId in self.likedBy.pop(userId, ()):
+            _remove(self.liked, likerId, userId)
+
+    def addLikes(self, userId: int, targetIds: Iterable[int]):
+        targetIds = list(targetIds)
+        with self.lock:
+            self._addLikes(userId, targetIds)
+            if self.pending is not None:
+                self.pending.append((self._addLikes, userId, targetIds))
+
+    def forgetUser(self, userId: int):
+        with self.lock:
+            self._forgetUser(userId)
+            if self.pending is not None:
+                self.pending.append((self._forgetUser, userId))
+
+    def beginLoad(self):
+        with self.lock:
+            self.pending = []
+
+    def _replace(self, liked: Dict[int, array], likedBy: Dict[int, array]):
+        with self.lock:
+            self.liked, self.likedBy = liked, likedBy
+            for update, *args in self.pending or ():
+                update(*args)
+            self.pending = None
+
+    def hasLiked(self, userId: int, targetId: int) -> bool:
+        values = self.liked.get(userId)
+        return values is not None and _contains(values, targetId)
+
+    def likedIds(self, userId: int) -> array:
+        with self.lock:
+            return array('i', self.liked.get(userId, ()))
+
+    def likedByIds(self, userId: int) -> array:
+        with self.lock:
+            return array('i', self.likedBy.get(userId, ()))
+
+    def pairCount(self) -> int:
+        return sum(len(values) for values in self.liked.values())
+
+    def loadFromDatabase(self, afterId: Optional[int] = None):
+        # Without afterId, builds new arrays from every like, streamed in (userId, targetId) order so
+        # each liked[] array is appended in order and likedBy[] arrays get their likers in order too.
+        # With it, adds the likes after that swipe id to the live arrays
+        fresh = afterId is None
+        db = localSession()
+        try:
+            loadedThrough = db.scalar(select(func.max(Swipe.id))) or 0
+            rows = db.execute(
+                select(Swipe.userId, Swipe.targetId)
+                .where(Swipe.isLike == True, Swipe.id > (afterId or 0), Swipe.id <= loadedThrough)
+                .order_by(Swipe.userId, Swipe.targetId)
+                .execution_options(yield_per=LOAD_BATCH_SIZE)
+            )
+            if fresh:
+                liked, likedBy = {}, {}
+                for userId, targetId in rows:
+                    liked.setdefault(userId, array('i')).append(targetId)
+                    likedBy.setdefault(targetId, array('i')).append(userId)
+                self._replace(liked, likedBy)
+            else:
+                for userId, targetId in rows:
+                    self.addLikes(userId, [targetId])
+        finally:
+            db.close()
+        self.loadedThrough = max(self.loadedThrough, loadedThrough)
+        self.loaded = True
+
+    def saveSnapshot(self, path: str):
+        # Header, then all pairs as two flat little-endian int32 arrays (liker ids, liked ids)
+        with self.lock:
+            userIds, targetIds = array('i'), array('i')
+            for userId in sorted(self.liked):
+                values = self.liked[userId]
+                userIds.extend([userId] * len(values))
+                targetIds.extend(values)
+        if sys.byteorder == "big":
+            userIds.byteswap()
+            targetIds.byteswap()
+        # Every worker snapshots on shutdown: each writes its own temp file beside the target and
+        # renames it into place, so concurrent saves never interleave and the last rename wins
+        out = tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False)
+        try:
+            with out:
+                out.write(_HEADER.pack(_MAGIC, 1, self.loadedThrough, len(userIds)))
+                userIds.tofile(out)
+                targetIds.tofile(out)
+            os.replace(out.name, path)
+        except BaseException:
+            try:
+                os.remove(out.name)
+            except OSError:
+                pass
+            raise
+
+    def loadSnapshot(self, path: str):
+        with open(path, "rb") as source:
+            magic, version, loadedThrough, count = _HEADER.unpack(source.read(_HEADER.size))
+            if magic != _MAGIC or version != 1:
+                raise ValueError(f"Not a swipe graph snapshot: {path}")
+            userIds, targetIds = array('i'), array('i')
+            userIds.fromfile(source, count)
+            targetIds.fromfile(source, count)
+        if sys.byteorder == "big":
+            userIds.byteswap()
+            targetIds.byteswap()
+
+        # Pairs were written sorted by liker, then target
+        liked, likedBy = {}, {}
+        start = 0
+        while start < count:
+            userId = userIds[start]
+            end = start
+            while end < count and userIds[end] == userId:
+                end += 1
+            liked[userId] = targetIds[start:end]
+            start = end
+        for userId in sorted(liked):
+            for targetId in liked[userId]:
+                likedBy.setdefault(targetId, array('i')).append(userId)
+
+        self._replace(liked, likedBy)
+        self.loadedThrough = loadedThrough
+
+swipeGraph = SwipeGraph()
+
+def _applyUpdate(payload: dict):
+    if payload.get("op") == "like":
+        swipeGraph.addLikes(int(payload["userId"]), [int(targetId) for targetId in payload["targetIds"]])
+    elif payload.get("op") == "forget":
+        swipeGraph.forgetUser(int(payload["userId"]))
+
+_updatesLost = False  # Set while the Redis subscription is down
+
+def _markStale():
+    # Other workers' likes no longer arrive; lookups fall back to SQL until the graph is reloaded
+    global _updatesLost
+    _updatesLost = True
+    swipeGraph.loaded = False
+    logger.warning("Swipe graph updates lost, using SQL until it is reloaded")
+
+def _resync():
+    # The subscription is back: rebuild from the database, which has every like missed meanwhile
+    global _updatesLost
+    _updatesLost = False
+    _load(useSnapshot=False)
+    logger.info(f"Swipe graph reloaded: {swipeGraph.pairCount()} likes")
+
+realtime.addChannel(GRAPH_CHANNEL, _applyUpdate, onLost=_markStale, onRestored=_resync)
+
+def recordLikes(userId: int, targetIds: Iterable[int]):
+    # Call after the likes are committed; applied here at once and on the other workers via Redis
+    payload = {"op": "like", "userId": userId, "targetIds": list(targetIds)}
+    if payload["targetIds"]:
+        _applyUpdate(payload)
+        realtime.publishToChannel(GRAPH_CHANNEL, payload)
+
+def forgetUser(userId: int):
+    payload = {"op": "forget", "userId": userId}
+    _applyUpdate(payload)
+    realtime.publishToChannel(GRAPH_CHANNEL, payload)
+
+# The lookups below return None until the graph is loaded; callers fall back to SQL
+
+def hasLiked(userId: int, targetId: int) -> Optional[bool]:
+    return swipeGraph.hasLiked(userId, targetId) if swipeGraph.loaded else None
+
+def likedIds(userId: int) -> Optional[array]:
+    return swipeGraph.likedIds(userId) if swipeGraph.loaded else None
+
+def likedByIds(userId: int) -> Optional[array]:
+    return swipeGraph.likedByIds(userId) if swipeGraph.loaded else None
+
+def _load(useSnapshot: bool = True):
+    # Updates published while loading are kept and replayed onto the loaded arrays; the catch-up
+    # pass then adds likes committed after the load read its highest swipe id
+    swipeGraph.beginLoad()
+    restored = False
+    if useSnapshot and SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+        try:
+            # Deleted accounts may linger in an old snapshot, which only ever excludes users that no longer exist
+            swipeGraph.loadSnapshot(SNAPSHOT_PATH)
+            restored = True
+        except Exception as e:
+            logger.error(f"Failed to restore swipe graph from {SNAPSHOT_PATH}, loading from the database: {e}")
+    if not restored:
+        swipeGraph.loadFromDatabase()
+    swipeGraph.loadFromDatabase(afterId=swipeGraph.loadedThrough)
+    if _updatesLost:
+        # Dropped while loading: stay on SQL, the resync once it's back loads again
+        swipeGraph.loaded = False
+
+async def startSwipeGraph():
+    try:
+        await asyncio.to_thread(_load)
+        logger.info(f"Swipe graph loaded: {swipeGraph.pairCount()} likes")
+    except Exception as e:
+        # Handlers keep using SQL until a restart succeeds
+        logger.error(f"Failed to load swipe graph: {e}")
+
+async def saveSwipeGraph():
+    if SNAPSHOT_PATH and swipeGraph.loaded:
+        try:
+            await asyncio.to_thread(swipeGraph.saveSnapshot, SNAPSHOT_PATH)
+        except Exception as e:
+            logger.error(f"Failed to write swipe graph snapshot to {SNAPSHOT_PATH}: {e}")
@@ -0,0 +1,123 @@
+import anyio
+from typing import Dict, Optional
+from fastapi import HTTPException, Request, status
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Magic-byte signatures of the image formats we accept, checked on the first bytes
+# of the upload itself (file names and client-sent content types are not trusted)
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+SNIFF_BYTES = 16
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for boundaries, part headers and form fields
+
+def sniffImageType(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS:
+        return "heif"
+    return None
+
+def _tooLarge(maxBytes: int):
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size: {maxBytes // (1024*1024)}MB"
+    )
+
+async def receiveUpload(request: Request, fileField: str, destPath: str, maxBytes: int, hasher=None) -> Dict[str, str]:
+    # Streams a multipart body straight to destPath in chunks with async file writes,
+    # stopping as soon as the file is too large or isn't an image. Returns the other form fields.
+    # The file's bytes are also fed to hasher (a hashlib object), if given.
+    contentLength = request.headers.get("content-length")
+    if contentLength and contentLength.isdigit() and int(contentLength) > maxBytes + MULTIPART_OVERHEAD:
+        raise _tooLarge(maxBytes)
+
+    contentType, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if contentType != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+
+    # The parser is synchronous: callbacks only collect, the awaits happen between chunks
+    part = {"name": None, "headerField": b"", "headerValue": b"", "data": []}
+    fields = {}
+    fileChunks = []
+    fileSeen = False
+
+    def onPartBegin():
+        part["name"] = None
+        part["data"] = []
+
+    def onHeaderField(data, start, end):
+        part["headerField"] += data[start:end]
+
+    def onHeaderValue(data, start, end):
+        part["headerValue"] += data[start:end]
+
+    def onHeaderEnd():
+        if part["headerField"].lower() == b"content-disposition":
+            _, disposition = parse_options_header(part["headerValue"])
+            name = disposition.get(b"name")
+            part["name"] = name.decode("latin-1") if name else None
+        part["headerField"], part["headerValue"] = b"", b""
+
+    def onPartData(data, start, end):
+        nonlocal fileSeen
+        if part["name"] == fileField:
+            fileSeen = True
+            fileChunks.append(data[start:end])
+        else:
+            part["data"].append(data[start:end])
+
+    def onPartEnd():
+        if part["name"] and part["name"] != fileField:
+            fields[part["name"]] = b"".join(part["data"]).decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": onPartBegin,
+        "on_header_field": onHeaderField,
+        "on_header_value": onHeaderValue,
+        "on_header_end": onHeaderEnd,
+        "on_part_data": onPartData,
+        "on_part_end": onPartEnd,
+    })
+
+    total = 0
+    received = 0
+    head = b""
+    try:
+        async with await anyio.open_file(destPath, "wb") as out:
+            async for chunk in request.stream():
+                # Chunked bodies carry no Content-Length, so the whole body is capped as it arrives too
+                total += len(chunk)
+                if total > maxBytes + MULTIPART_OVERHEAD:
+                    raise _tooLarge(maxBytes)
+                parser.write(chunk)
+                if not fileChunks:
+                    continue
+                data = b"".join(fileChunks)
+                fileChunks.clear()
+
+                received += len(data)
+                if received > maxBytes:
+                    raise _tooLarge(maxBytes)
+                if len(head) < SNIFF_BYTES:
+                    head += data[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES and sniffImageType(head) is None:
+                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported image type")
+                if hasher is not None:
+                    hasher.update(data)
+                await out.write(data)
+            parser.finalize()
+
+        if not fileSeen or received == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded")
+        if sniffImageType(head) is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported image type")
+    except BaseException:
+        await anyio.Path(destPath).unlink(missing_ok=True)
+        raise
+    return fields
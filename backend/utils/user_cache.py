@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime
+from models.user import User
+from utils.auth import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Authenticated-user cache keyed by token subject (email): a per-worker LRU in front
+# of an optional shared Redis layer. Entries are plain column dicts, never ORM objects.
+CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 30))  # Seconds; also bounds staleness on other workers
+CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 1024))
+USE_REDIS = os.getenv('AUTH_CACHE_REDIS', 'true').lower() == 'true'
+
+_DATETIME_COLUMNS = {c.name for c in User.__table__.columns if isinstance(c.type, DateTime)}
+
+class TTLCache:
+
+    def __init__(self, maxSize: int, ttl: int):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expiresAt, value = entry
+            if expiresAt < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+_local = TTLCache(CACHE_SIZE, CACHE_TTL)
+
+def _redisKey(email: str) -> str:
+    return f"authuser:{email}"
+
+def userToRow(user: User) -> dict:
+    return {c.name: getattr(user, c.name) for c in User.__table__.columns}
+
+def getCachedUser(email: str) -> Optional[dict]:
+    row = _local.get(email)
+    if row is not None:
+        return row
+
+    if USE_REDIS and redis_client is not None:
+        try:
+            raw = redis_client.get(_redisKey(email))
+        except Exception as e:
+            logger.error(f"Failed to read cached user from Redis: {e}")
+            raw = None
+        if raw:
+            row = json.loads(raw)
+            for name in _DATETIME_COLUMNS:
+                if row.get(name):
+                    row[name] = datetime.fromisoformat(row[name])
+            _local.set(email, row)
+            return row
+    return None
+
+def cacheUser(user: User) -> dict:
+    row = userToRow(user)
+    _local.set(user.email, row)
+    if USE_REDIS and redis_client is not None:
+        try:
+            redis_client.setex(_redisKey(user.email), CACHE_TTL, json.dumps(row, default=str))
+        except Exception as e:
+            logger.error(f"Failed to cache user in Redis: {e}")
+    return row
+
+def invalidateCachedUser(email: str):
+    _local.delete(email)
+    if USE_REDIS and redis_client is not None:
+        try:
+            redis_client.delete(_redisKey(email))
+        except Exception as e:
+            logger.error(f"Failed to invalidate cached user in Redis: {e}")
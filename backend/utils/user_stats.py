@@ -0,0 +1,64 @@
+import os
+from typing import Dict
+from sqlalchemy import select, func, literal, exists, union_all, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.user_stats import UserStats
+from models.swipe import Swipe
+from models.match import Match
+
+# Counters are incremented in the same transaction as the like/match they count, and recounted
+# from swipes/matches when a user reads them after STATS_RECONCILE_SECONDS. That corrects drift
+# from writes that don't bump them (account deletions cascading away likes and matches).
+STATS_RECONCILE_SECONDS = int(os.getenv('STATS_RECONCILE_SECONDS', 3600))
+
+COUNTERS = ("likesSent", "likesReceived", "matches")
+
+def _upsert(rows):
+    # Rows sorted by userId, so concurrent writers lock stats rows in the same order.
+    # A row created by an increment has no reconciledAt, so its first read recounts it
+    statement = pg_insert(UserStats).from_select(["userId", *COUNTERS], rows)
+    return statement.on_conflict_do_update(
+        index_elements=["userId"],
+        set_={name: getattr(UserStats, name) + getattr(statement.excluded, name) for name in COUNTERS}
+    )
+
+def likeCountersCte(likerId: int, targetId: int, newSwipe, newMatch):
+    # For the single-statement like: counts only if newSwipe inserted a row, and a match if newMatch did
+    matched = select(func.count()).select_from(newMatch).scalar_subquery()
+    liked = exists(select(newSwipe.c.id))
+    rows = union_all(
+        select(literal(likerId).label("userId"), literal(1).label("likesSent"), literal(0).label("likesReceived"), matched.label("matches")).where(liked),
+        select(literal(targetId), literal(0), literal(1), matched).where(liked)
+    ).subquery()
+    return _upsert(select(rows).order_by(rows.c.userId)).returning(UserStats.userId).cte("counted")
+
+async def incrementStats(db: AsyncSession, increments: Dict[int, Dict[str, int]]):
+    # {userId: {"likesSent": n, ...}}; runs in the caller's transaction
+    if not increments:
+        return
+    rows = union_all(*(
+        select(
+            literal(userId).label("userId"),
+            *(literal(counts.get(name, 0)).label(name) for name in COUNTERS)
+        )
+        for userId, counts in sorted(increments.items())
+    )).subquery()
+    await db.execute(_upsert(select(rows).order_by(rows.c.userId)))
+
+async def reconcileStats(db: AsyncSession, userId: int) -> UserStats:
+    counts = select(
+        literal(userId),
+        select(func.count(Swipe.id)).where(Swipe.userId == userId, Swipe.isLike == True).scalar_subquery(),
+        select(func.count(Swipe.id)).where(Swipe.targetId == userId, Swipe.isLike == True).scalar_subquery(),
+        select(func.count(Match.id)).where(or_(Match.userId1 == userId, Match.userId2 == userId)).scalar_subquery(),
+        func.now()
+    )
+    statement = pg_insert(UserStats).from_select(["userId", *COUNTERS, "reconciledAt"], counts)
+    statement = statement.on_conflict_do_update(
+        index_elements=["userId"],
+        set_={name: getattr(statement.excluded, name) for name in (*COUNTERS, "reconciledAt")}
+    ).returning(UserStats)
+    stats = (await db.scalars(statement, execution_options={"populate_existing": True})).one()
+    await db.commit()
+    return stats
@@ -117,7 +117,7 @@ const DiscoverPage = () => {
 
   let imageSrc = null;
   if (primaryImage?.imageUrl) {
-    const raw = primaryImage.imageUrl;
+    const raw = primaryImage.mediumUrl || primaryImage.imageUrl;
     imageSrc = raw.startsWith('http')
       ? raw
       : `${API_URL.replace(/\/+$/, '')}/${raw.replace(/^\/+/, '')}`;
@@ -9,15 +9,18 @@ export default function MatchesPage() {
   const { token } = useAuth();
   const navigate = useNavigate();
   const [matches, setMatches] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
 
   useEffect(() => {
     const load = async () => {
       try {
         setLoading(true);
-        const data = await interactionsService.getMatches(token);
-        setMatches(data);
+        const page = await interactionsService.getMatches(token);
+        setMatches(page.matches);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error("load matches error", err);
         setError("Couldn't load matches");
@@ -28,6 +31,21 @@ export default function MatchesPage() {
     load();
   }, [token]);
 
+  // The API pages matches (newest first); older ones load on demand until there's no cursor left
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await interactionsService.getMatches(token, nextCursor);
+      setMatches((prev) => [...prev, ...page.matches]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("load more matches error", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const messageClick = async (id) => {
     try {
       const convo = await createConversation(id);
@@ -80,13 +98,14 @@ export default function MatchesPage() {
     <div className="matches-container">
       <div className="matches-header">
         <h1>Your Matches</h1>
-        <p>{matches.length} total</p>
+        <p>{nextCursor ? `${matches.length}+` : matches.length} total</p>
       </div>
 
       <div className="matches-grid">
         {matches.map((m) => {
           const img = m.user.images?.find((i) => i.isPrimary) || m.user.images?.[0];
-          const src = img ? (img.imageUrl.startsWith("http") ? img.imageUrl : `http://localhost:8000/${img.imageUrl}`) : null;
+          const url = img ? (img.mediumUrl || img.imageUrl) : null;
+          const src = url ? (url.startsWith("http") ? url : `http://localhost:8000/${url}`) : null;
 
           return (
             <div key={m.id} className="match-card">
@@ -133,6 +152,14 @@ export default function MatchesPage() {
           );
         })}
       </div>
+
+      {nextCursor && (
+        <div className="matches-load-more">
+          <button onClick={loadMore} disabled={loadingMore} className="discover-button">
+            {loadingMore ? "Loading..." : "Load more matches"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
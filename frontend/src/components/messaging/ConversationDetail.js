@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { getConversation, sendMessage, markAsRead } from '../../services/messageService';
+import { getConversation, getMessages, sendMessage, markAsRead } from '../../services/messageService';
 import MessageInput from './MessageInput';
 import '../../styles/messaging/ConversationDetail.css';
 
@@ -9,6 +9,8 @@ function ConversationDetail() {
   const navigate = useNavigate();
   const [conversation, setConversation] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -19,6 +21,8 @@ function ConversationDetail() {
         const data = await getConversation(conversationId);
         setConversation(data);
         setMessages(data.messages || []);
+        // The detail carries only the newest page; older history is paged in on demand
+        setOlderCursor(data.messagesCursor || null);
         setError(null);
       } catch (err) {
         setError('Failed to load conversation');
@@ -48,6 +52,20 @@ function ConversationDetail() {
     markConversationRead();
   }, [conversationId]);
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const page = await getMessages(conversationId, olderCursor);
+      setMessages(prev => [...page.messages, ...prev]);
+      setOlderCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Error loading older messages:', err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const handleSendMessage = async (content) => {
     try {
       const newMessage = await sendMessage(conversationId, content);
@@ -71,6 +89,11 @@ function ConversationDetail() {
       </div>
       
       <div className="messages-container">
+        {olderCursor && (
+          <button onClick={loadOlderMessages} disabled={loadingOlder} className="load-older-button">
+            {loadingOlder ? 'Loading...' : 'Load older messages'}
+          </button>
+        )}
         {messages.map((message) => (
           <div 
             key={message.id} 
@@ -56,7 +56,10 @@ function ConversationsList() {
                 <div className="conversation-avatar">
                   {otherUser.images && otherUser.images.length > 0 ? (
                     <img 
-                      src={otherUser.images.find(img => img.isPrimary)?.imageUrl || otherUser.images[0].imageUrl} 
+                      src={(() => {
+                        const img = otherUser.images.find(img => img.isPrimary) || otherUser.images[0];
+                        return img.smallUrl || img.imageUrl;
+                      })()} 
                       alt={`${otherUser.name || 'User'}'s avatar`} 
                     />
                   ) : (
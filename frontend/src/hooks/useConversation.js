@@ -1,9 +1,10 @@
 import { useState, useEffect, useCallback } from 'react';
-import { getConversation, sendMessage, markConversationAsRead } from '../services/messageService';
+import { getConversation, getMessages, sendMessage, markConversationAsRead } from '../services/messageService';
 
 export default function Conversations(conversationId) {
     const [conversation, setConversation] = useState(null);
     const [messages, setMessages] = useState([]);
+    const [olderCursor, setOlderCursor] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
 
@@ -13,7 +14,14 @@ export default function Conversations(conversationId) {
         try{
             const data = await getConversation(conversationId);
             setConversation(data);
-            setMessages(data.messages || []);
+            // data.messages is only the newest page: keep any older history already paged in
+            setMessages((prevMessages) => {
+                const latest = data.messages || [];
+                const firstLatestId = latest.length ? latest[0].id : null;
+                const older = firstLatestId === null ? [] : prevMessages.filter((message) => message.id < firstLatestId);
+                return [...older, ...latest];
+            });
+            setOlderCursor((prevCursor) => prevCursor || data.messagesCursor || null);
         }
         catch (error) {
             setError(error.message);
@@ -39,6 +47,19 @@ export default function Conversations(conversationId) {
         }
     }, [conversationId]);
 
+    const loadOlder = useCallback(async () => {
+        if (!conversationId || !olderCursor) return;
+        try {
+            const page = await getMessages(conversationId, olderCursor);
+            setMessages((prevMessages) => [...page.messages, ...prevMessages]);
+            setOlderCursor(page.nextCursor);
+        }
+        catch (error) {
+            setError(error.message);
+            console.error('Error loading older messages:', error);
+        }
+    }, [conversationId, olderCursor]);
+
     const markAsRead = useCallback(async () => {
         if (!conversationId) return;
         try {
@@ -59,6 +80,6 @@ export default function Conversations(conversationId) {
         return () => clearInterval(interval);
     }, [conversationId, getConversation]);
 
-    return { conversation, messages, loading, error, sendMessage: sendMessage, markAsRead, refresh: getConversation };
+    return { conversation, messages, loading, error, sendMessage: sendMessage, markAsRead, refresh: getConversation, loadOlder, hasOlder: Boolean(olderCursor) };
    
 }
\ No newline at end of file
@@ -3,12 +3,13 @@ import axios from 'axios';
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
 export const interactionsService = {
-  // Get user matches
-  getMatches: async (token) => {
+  // Get one page of user matches, newest first; pass the previous nextCursor for the next page
+  getMatches: async (token, cursor = null) => {
     const response = await axios.get(`${API_URL}/interactions/matches`, {
+      params: cursor ? { cursor } : {},
       headers: { 'Authorization': `Bearer ${token}` }
     });
-    return response.data;
+    return { matches: response.data, nextCursor: response.headers['x-next-cursor'] || null };
   },
 
   // Like a profile (swipe right)
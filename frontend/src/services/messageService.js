@@ -32,6 +32,20 @@ const getAuthHeader = () => {
     }
   };
 
+  // Older history: pass the conversation's messagesCursor (or the previous X-Next-Cursor) as `before`
+  export const getMessages = async (conversationId, before = null, limit = 50) => {
+    try {
+      const response = await axios.get(`${API_URL}/messages/conversations/${conversationId}/messages`, {
+        params: before ? { before, limit } : { limit },
+        headers: getAuthHeader()});
+      return { messages: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    } 
+    catch (error) {
+      console.error('Error fetching messages:', error);
+      throw error;
+    }
+  };
+
   export const markAsRead = async (conversationId) => {
     try {
       const response = await axios.put(